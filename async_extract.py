@@ -0,0 +1,311 @@
+import fitz  # PyMuPDF
+import asyncio
+import collections
+import contextlib
+import functools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import reader16
+import reader20
+from batch import load_strategy
+from document_pool import DocumentPool
+from pdf_output import ChunkedPdfWriter
+from render_cache import document_digest
+from result_cache import cached_page_result, function_fingerprint
+from table_crop import place_image, render_shard, unpack_image
+from table_output import open_table_writer
+
+# Pages submitted ahead of the consumer, per document
+DEFAULT_IN_FLIGHT = 8
+
+# PyMuPDF work that has to happen in this process (rebuilding pixmaps,
+# placing regions, saving) runs on this one thread: PyMuPDF is not
+# thread-safe, and the event loop never waits on it
+_fitz_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fitz")
+
+# Shared worker pool, created on first use
+_process_executor = None
+
+# Open documents of the current worker process, created on first use
+_documents = None
+
+
+def default_executor():
+    """The process pool used when no executor is passed in, one worker per CPU."""
+    global _process_executor
+    if _process_executor is None:
+        _process_executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _process_executor
+
+
+def _worker_document(path):
+    # Every page task of a document lands on some worker; each worker opens it once
+    global _documents
+    if _documents is None:
+        _documents = DocumentPool()
+    return _documents.get(path)
+
+
+def _parse_page(input_pdf_path, page_num, parse_page, cache, params):
+    doc = _worker_document(input_pdf_path)
+    page = doc.load_page(page_num)
+    return cached_page_result(cache, doc, page, params, lambda: parse_page(page_num, page))
+
+
+def _detect_region(input_pdf_path, page_num, find_table_rect, dpi, render, cache, params, render_policy, render_cache, digest):
+    doc = _worker_document(input_pdf_path)
+    regions = render_shard(doc, [page_num], find_table_rect, dpi, render, cache, params, render_policy, render_cache, digest)
+    return regions[0] if regions else None
+
+
+def _run_strategy(strategy, input_path, output_path, options):
+    load_strategy(strategy)(input_path, output_path, **options)
+
+
+def _page_count(input_pdf_path):
+    doc = fitz.open(input_pdf_path)
+    page_count = len(doc)
+    doc.close()
+    return page_count
+
+
+async def _run_fitz(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_fitz_executor, functools.partial(func, *args))
+
+
+async def _iter_page_tasks(page_count, submit, max_in_flight):
+    # Yields (page_num, result) in page order with at most max_in_flight pages
+    # submitted and not yet consumed, so a slow consumer holds the workers back.
+    # Closing or cancelling the iterator cancels the pages still queued.
+    pending = collections.deque()
+    next_page = 0
+    try:
+        while next_page < page_count or pending:
+            while next_page < page_count and len(pending) < max_in_flight:
+                pending.append((next_page, submit(next_page)))
+                next_page += 1
+            page_num, future = pending.popleft()
+            yield page_num, await future
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+async def aiter_page_tables(input_pdf_path, parse_page=reader20.parse_page_table, cache=None,
+                            max_in_flight=DEFAULT_IN_FLIGHT, executor=None):
+    """
+    Async iterator of (page_num, table_data) for every page where
+    `parse_page(page_num, page)` returns a table, in page order.
+
+    Pages are parsed in a process pool whose workers keep their documents
+    open, with at most `max_in_flight` pages ahead of the consumer. Use it
+    with `contextlib.aclosing` when breaking out early, so queued pages are
+    cancelled straight away.
+
+    Args:
+        input_pdf_path (str): The path to the input PDF file.
+        parse_page (callable): A module-level page parser, e.g. reader20.parse_page_table.
+        cache (ResultCache, optional): Persistent cache of parsed pages.
+        max_in_flight (int): Pages submitted ahead of the consumer.
+        executor (Executor, optional): A process pool; defaults to default_executor().
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or default_executor()
+    params = function_fingerprint(parse_page) if cache is not None else None
+    page_count = await _run_fitz(_page_count, input_pdf_path)
+
+    def submit(page_num):
+        return loop.run_in_executor(executor, _parse_page, input_pdf_path, page_num, parse_page, cache, params)
+
+    async with contextlib.aclosing(_iter_page_tasks(page_count, submit, max_in_flight)) as results:
+        async for page_num, table_data in results:
+            if table_data is not None:
+                yield page_num, table_data
+
+
+async def aiter_table_regions(input_pdf_path, find_table_rect=reader16.find_table_rect, dpi=300, render=True,
+                              cache=None, max_in_flight=DEFAULT_IN_FLIGHT, executor=None, render_policy=None,
+                              render_cache=None):
+    """
+    Async iterator of (page_num, page_rect, table_rect, image), the async
+    counterpart of table_crop.iter_table_regions.
+
+    Detection and `dpi` rendering run in a process pool, with at most
+    `max_in_flight` pages ahead of the consumer; only the finished pixmap
+    is rebuilt in this process. With a RenderPolicy the image arrives
+    already encoded. With render=False image is None.
+
+    Args:
+        input_pdf_path (str): The path to the input PDF file.
+        find_table_rect (callable): A module-level detector taking a PageAnalysis.
+        dpi (int): Render resolution for the table regions.
+        render (bool): Whether to render the regions at all.
+        cache (ResultCache, optional): Persistent cache of detection results.
+        max_in_flight (int): Pages submitted ahead of the consumer.
+        executor (Executor, optional): A process pool; defaults to default_executor().
+        render_policy (RenderPolicy, optional): How regions are rendered and encoded.
+        render_cache (RenderCache, optional): Persistent cache of rendered regions.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or default_executor()
+    params = function_fingerprint(find_table_rect) if cache is not None else None
+    page_count = await _run_fitz(_page_count, input_pdf_path)
+    digest = await _run_fitz(document_digest, input_pdf_path) if render and render_cache is not None else None
+
+    def submit(page_num):
+        return loop.run_in_executor(
+            executor, _detect_region, input_pdf_path, page_num, find_table_rect, dpi, render, cache, params,
+            render_policy, render_cache, digest,
+        )
+
+    async with contextlib.aclosing(_iter_page_tasks(page_count, submit, max_in_flight)) as results:
+        async for _, region in results:
+            if region is None:
+                continue
+            page_num, page_rect, table_rect, packed = region
+            image = await _run_fitz(unpack_image, packed)
+            yield page_num, fitz.Rect(page_rect), fitz.Rect(table_rect), image
+
+
+def _place_region(output_doc, source_doc, layout_table_page, page_num, page_rect, table_rect, image):
+    new_page, image_rect = layout_table_page(output_doc, page_num, page_rect, table_rect)
+    if image is None:
+        new_page.show_pdf_page(image_rect, source_doc, page_num, clip=table_rect)
+    else:
+        place_image(new_page, image_rect, image)
+
+
+async def extract_transaction_table_region_async(input_pdf_path, output_pdf_path, mode="raster", cache=None,
+                                                 max_in_flight=DEFAULT_IN_FLIGHT, executor=None, render_policy=None,
+                                                 render_cache=None):
+    """
+    Async version of reader16.extract_transaction_table_region.
+
+    Rendering runs in worker processes and placing and saving on a single
+    background thread, so the event loop stays free while many documents
+    are in flight. Cancelling the task stops submitting pages and cancels
+    the queued ones; nothing is saved.
+
+    Args:
+        input_pdf_path (str): The path to the input PDF file.
+        output_pdf_path (str): The path to the output PDF file.
+        mode (str): "raster" or "vector", as in table_crop.build_table_pages.
+        cache (ResultCache, optional): Persistent cache of detection results.
+        max_in_flight (int): Pages submitted ahead of the output document.
+        executor (Executor, optional): A process pool; defaults to default_executor().
+        render_policy (RenderPolicy, optional): How raster regions are rendered and encoded.
+        render_cache (RenderCache, optional): Persistent cache of rendered regions.
+    """
+    if mode not in ("raster", "vector"):
+        raise ValueError(f"Unknown crop mode: {mode!r}")
+
+    output_doc = await _run_fitz(ChunkedPdfWriter)
+    # Vector placement reads straight from the source document
+    source_doc = await _run_fitz(fitz.open, input_pdf_path) if mode == "vector" else None
+
+    try:
+        regions = aiter_table_regions(
+            input_pdf_path, reader16.find_table_rect, render=mode == "raster",
+            cache=cache, max_in_flight=max_in_flight, executor=executor, render_policy=render_policy,
+            render_cache=render_cache,
+        )
+        async with contextlib.aclosing(regions):
+            async for page_num, page_rect, table_rect, image in regions:
+                await _run_fitz(
+                    _place_region, output_doc, source_doc, reader16.layout_table_page,
+                    page_num, page_rect, table_rect, image,
+                )
+
+        if output_doc.page_count > 0:
+            await _run_fitz(output_doc.save, output_pdf_path)
+            print(f"✅ Table-only pages saved to: {output_pdf_path}")
+        else:
+            print("⚠️ No matching pages found.")
+    finally:
+        await _run_fitz(output_doc.close)
+        if source_doc is not None:
+            await _run_fitz(source_doc.close)
+
+
+async def extract_transaction_table_to_json_async(input_pdf_path, output_json_path, cache=None, output_format="json",
+                                                  max_in_flight=DEFAULT_IN_FLIGHT, executor=None, batch_rows=None):
+    """
+    Async version of reader20.extract_transaction_table_to_json, with the same
+    output formats. Pages are parsed in worker processes and file writes run
+    off the event loop.
+
+    Args:
+        input_pdf_path (str): The path to the input PDF file.
+        output_json_path (str): The path to the output file.
+        cache (ResultCache, optional): Persistent cache of parsed pages.
+        output_format (str): "json", "jsonl", "jsonl-rows", "parquet" or "arrow".
+        max_in_flight (int): Pages submitted ahead of the writer.
+        executor (Executor, optional): A process pool; defaults to default_executor().
+        batch_rows (int, optional): Rows per row group for "parquet" and "arrow".
+    """
+    loop = asyncio.get_running_loop()
+    all_table_data = []
+    table_writer = await loop.run_in_executor(None, open_table_writer, output_json_path, output_format, batch_rows)
+
+    try:
+        tables = aiter_page_tables(
+            input_pdf_path, reader20.parse_page_table, cache=cache, max_in_flight=max_in_flight, executor=executor
+        )
+        async with contextlib.aclosing(tables):
+            async for page_num, table_data in tables:
+                if table_writer is not None:
+                    await loop.run_in_executor(None, table_writer.write_table, page_num, 0, table_data)
+                else:
+                    all_table_data.append(table_data)
+    finally:
+        if table_writer is not None:
+            await loop.run_in_executor(None, table_writer.close)
+
+    if table_writer is not None:
+        if table_writer.tables_written:
+            print(f"✅ {table_writer.tables_written} table(s) streamed to: {output_json_path}")
+        else:
+            print("⚠️ No matching tables found in the PDF.")
+        return
+
+    if all_table_data:
+        final_data = all_table_data[0] if len(all_table_data) == 1 else all_table_data
+
+        def dump():
+            with open(output_json_path, "w", encoding="utf-8") as f:
+                json.dump(final_data, f, ensure_ascii=False, indent=4)
+
+        await loop.run_in_executor(None, dump)
+        print(f"✅ Table data successfully saved to: {output_json_path}")
+    else:
+        print("⚠️ No matching tables found in the PDF.")
+
+
+async def extract_async(strategy, input_path, output_path, executor=None, **options):
+    """
+    Runs any whole-document strategy in the process pool and waits for it
+    without blocking the loop, e.g. the pdfplumber readers:
+
+        await extract_async("reader21:extract_transaction_table_with_plumber", "in.pdf", "out.json")
+
+    `strategy` is resolved as in batch.load_strategy.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor or default_executor(), _run_strategy, strategy, input_path, output_path, options)
+
+
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\transactions_table_only_clean.pdf"
+    output_json = r"C:\Users\Suren\Downloads\transactions_table_data.json"
+
+    async def main():
+        await asyncio.gather(
+            extract_transaction_table_region_async(input_pdf, output_pdf),
+            extract_transaction_table_to_json_async(input_pdf, output_json),
+        )
+
+    asyncio.run(main())
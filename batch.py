@@ -0,0 +1,239 @@
+import argparse
+import contextlib
+import glob
+import importlib
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# Strategies already imported by this worker process, keyed by strategy name
+_strategies = {}
+
+
+def find_input_pdfs(source):
+    """
+    Lists the PDFs to process: every .pdf file (any case, e.g. .PDF) in
+    `source` and its subdirectories if it is a directory, otherwise every
+    file matching `source` as a glob pattern (** allowed).
+    """
+    if not os.path.isdir(source):
+        return sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    return sorted(
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(source)
+        for name in names
+        if name.lower().endswith(".pdf")
+    )
+
+
+def load_strategy(strategy):
+    """
+    Resolves a strategy to the extraction function: either a pdfreader name
+    (e.g. "extract_transaction_table_to_json") or "module:function" (e.g.
+    "reader12:extract_transaction_table_region"). Each worker imports a
+    strategy once and reuses it for every document it is given.
+    """
+    if strategy not in _strategies:
+        if ":" in strategy:
+            module_name, function_name = strategy.split(":")
+        else:
+            module_name, function_name = "pdfreader", strategy
+        _strategies[strategy] = getattr(importlib.import_module(module_name), function_name)
+    return _strategies[strategy]
+
+
+def output_paths(inputs, output_dir, output_suffix):
+    """
+    The output path of every input: <input stem><output_suffix> under
+    `output_dir`, in the same subdirectory the input has below the inputs'
+    common directory, so a.pdf in two source folders gets two outputs.
+    """
+    if not inputs:
+        return []
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in inputs])
+    paths = []
+    for path in inputs:
+        relative = os.path.relpath(os.path.splitext(os.path.abspath(path))[0], base)
+        paths.append(os.path.join(output_dir, relative + output_suffix))
+    return paths
+
+
+def _file_state(path):
+    # Enough of a file's stat to tell whether it was written since
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _failed_entry(input_path, output_path, error):
+    return {"input": input_path, "output": output_path, "status": "failed", "error": error,
+            "seconds": None, "output_bytes": None, "log": ""}
+
+
+def _process_one(strategy, input_path, output_path, options):
+    # Runs in a worker process; failures are reported, never raised, so one
+    # bad statement cannot take down the rest of the batch
+    start = time.perf_counter()
+    log = io.StringIO()
+    entry = {"input": input_path, "output": output_path}
+    previous_output = _file_state(output_path)
+
+    try:
+        extract = load_strategy(strategy)
+        with contextlib.redirect_stdout(log):
+            extract(input_path, output_path, **options)
+        entry["status"] = "ok"
+        entry["error"] = None
+    except Exception as e:
+        entry["status"] = "failed"
+        entry["error"] = f"{type(e).__name__}: {e}"
+
+    entry["seconds"] = round(time.perf_counter() - start, 4)
+    # A file left by an earlier run is not this run's output
+    output = _file_state(output_path)
+    entry["output_bytes"] = output[2] if output is not None and output != previous_output else None
+    entry["log"] = log.getvalue()
+    return entry
+
+
+def run_batch(source, output_dir, strategy, output_suffix, workers=None, manifest_path=None, **options):
+    """
+    Runs one extraction strategy over many PDFs with a bounded process pool.
+
+    Worker processes are reused across documents, so interpreter start-up and
+    PyMuPDF/pdfplumber imports are paid once per worker instead of once per
+    file. At most a few tasks per worker are queued at any time.
+
+    A worker that dies (e.g. a MuPDF crash or the OOM killer) breaks the
+    pool and every document in flight with it. The pool is restarted and
+    those documents run again. A document caught in a second broken pool
+    then runs alone, and is marked failed only if it breaks the pool again,
+    so one crashing statement cannot fail the documents around it. The
+    manifest is always written.
+
+    Args:
+        source (str): A directory of PDFs, or a glob pattern.
+        output_dir (str): Where outputs go, named <input stem><output_suffix> in
+            the input's subdirectory below the inputs' common directory. PDFs
+            already inside it are not taken as inputs.
+        strategy (str): A pdfreader strategy name, or "module:function".
+        output_suffix (str): The output file suffix, e.g. ".pdf" or ".json".
+        workers (int, optional): Pool size; defaults to the CPU count.
+        manifest_path (str, optional): Where to write the JSON manifest; defaults
+            to manifest.json in output_dir.
+        **options: Extra keyword arguments for the strategy (e.g. mode="vector").
+
+    Returns:
+        list[dict]: One manifest entry per input with status, error, timing and
+        output size, in input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_dir, "manifest.json")
+
+    # Outputs of an earlier run under the source directory are not inputs
+    output_root = os.path.abspath(output_dir)
+    inputs = [
+        path for path in find_input_pdfs(source)
+        if os.path.commonpath([os.path.abspath(path), output_root]) != output_root
+    ]
+    outputs = output_paths(inputs, output_dir, output_suffix)
+    jobs = iter(range(len(inputs)))
+    entries = [None] * len(inputs)
+    # How often each document was in flight when the pool broke
+    breaks = [0] * len(inputs)
+    retries = deque()  # Caught in one broken pool: run again with the others
+    suspects = deque()  # Caught in two: run alone, failed if the pool breaks again
+    start = time.perf_counter()
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = {}
+
+    def submit(index):
+        os.makedirs(os.path.dirname(outputs[index]), exist_ok=True)
+        future = executor.submit(_process_one, strategy, inputs[index], outputs[index], options)
+        pending[future] = index
+
+    def fill():
+        # Keep the queue short so results and memory don't pile up for huge drops
+        while not any(breaks[index] >= 2 for index in pending.values()):
+            if suspects:
+                if pending:
+                    return
+                submit(suspects.popleft())
+            elif len(pending) >= workers * 2:
+                return
+            elif retries:
+                submit(retries.popleft())
+            else:
+                index = next(jobs, None)
+                if index is None:
+                    return
+                submit(index)
+
+    try:
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                # Every task of a broken pool fails with it; collect them all, then
+                # give the rest of the batch a fresh pool
+                done, _ = wait(pending)
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = ProcessPoolExecutor(max_workers=workers)
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                if not isinstance(error, BrokenProcessPool):
+                    entries[index] = future.result()
+                    continue
+                breaks[index] += 1
+                if breaks[index] == 1:
+                    retries.append(index)
+                elif breaks[index] == 2:
+                    suspects.append(index)
+                else:
+                    entries[index] = _failed_entry(inputs[index], outputs[index], f"{type(error).__name__}: {error}")
+            fill()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    failed = sum(entry["status"] != "ok" for entry in entries)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "strategy": strategy,
+            "files": len(entries),
+            "failed": failed,
+            "seconds": round(time.perf_counter() - start, 4),
+            "results": entries,
+        }, f, ensure_ascii=False, indent=4)
+
+    print(f"✅ Processed {len(entries)} file(s), {failed} failed. Manifest: {manifest_path}")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one extraction strategy over a directory or glob of PDFs.")
+    parser.add_argument("source", help="Directory of PDFs or glob pattern")
+    parser.add_argument("output_dir", help="Directory for outputs and the manifest")
+    parser.add_argument("--strategy", required=True, help='e.g. "extract_transaction_table_region" or "reader12:extract_transaction_table_region"')
+    parser.add_argument("--suffix", required=True, help='Output file suffix, e.g. ".pdf" or ".json"')
+    parser.add_argument("--workers", type=int, default=None, help="Pool size (default: CPU count)")
+    parser.add_argument("--manifest", default=None, help="Manifest path (default: <output_dir>/manifest.json)")
+    parser.add_argument("--options", default="{}", help='Strategy keyword arguments as JSON, e.g. \'{"mode": "vector"}\'')
+    args = parser.parse_args()
+
+    run_batch(
+        args.source, args.output_dir, args.strategy, args.suffix,
+        workers=args.workers, manifest_path=args.manifest, **json.loads(args.options),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from batch import load_strategy
+from render_policy import RenderPolicy
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is reported as None there
+    resource = None
+
+# Benchmarked strategies: name -> (strategy as in batch.load_strategy, output suffix, options)
+STRATEGIES = {
+    "text": ("reader:extract_transactions_table", ".txt", {}),
+    "block-crop": ("reader16:extract_transaction_table_region", ".pdf", {"mode": "vector"}),
+    "raster-crop": ("reader16:extract_transaction_table_region", ".pdf", {"mode": "raster"}),
+    "raster-crop-adaptive": ("reader16:extract_transaction_table_region", ".pdf", {"mode": "raster", "render_policy": RenderPolicy()}),
+    "raster-crop-mono": ("reader16:extract_transaction_table_region", ".pdf", {"mode": "raster", "render_policy": RenderPolicy(colorspace="mono")}),
+    "blocks-json": ("reader20:extract_transaction_table_to_json", ".jsonl", {"output_format": "jsonl-rows"}),
+    "plumber-json": ("reader22:extract_transaction_table_with_plumber", ".jsonl", {"output_format": "jsonl-rows"}),
+}
+
+COLUMNS = ["Date", "Description", "Amount", "Balance"]
+COLUMN_X = [50, 140, 360, 450, 545]
+ROW_HEIGHT = 18
+DESCRIPTIONS = ["Card payment", "Transfer to savings", "Salary", "Direct debit", "Cash withdrawal", "Refund", "Interest"]
+
+
+def make_statement_pdf(path, pages=50, table_density=0.5, rows_per_table=12, seed=0):
+    """
+    Writes a synthetic bank statement and returns its ground truth.
+
+    Table pages carry a top-right 'TRANSACTIONS' header above a blue rule,
+    a ruled table with a header row, and 'PRIMARY KEY' / 'CONSTRAINT'
+    trailer blocks below it, the layout the readers are written for. Other
+    pages only hold running text. Generation is deterministic for a seed.
+
+    Args:
+        path (str): Where to save the PDF.
+        pages (int): Number of pages.
+        table_density (float): Share of pages, 0..1, that carry a table.
+        rows_per_table (int): Data rows per table, capped to what fits on an A4 page.
+        seed (int): Seed for page selection and cell values.
+
+    Returns:
+        list[dict]: One {"page": 1-based page, "columns": [...], "rows": [[...], ...]}
+        per table page, in page order.
+    """
+    rng = random.Random(seed)
+    rows_per_table = min(rows_per_table, 34)
+    doc = fitz.open()
+    truth = []
+    balance = 1000.0
+
+    for page_num in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((50, 40), f"Account statement - page {page_num + 1}", fontsize=10)
+
+        if rng.random() >= table_density:
+            page.insert_textbox(fitz.Rect(50, 120, 545, 400), "Account terms and notices. " * 20, fontsize=10)
+            continue
+
+        page.insert_text((420, 62), "TRANSACTIONS", fontsize=14)
+        page.draw_line((40, 75), (555, 75), color=(0, 0, 1), width=1.5)
+
+        rows = []
+        for row_index in range(rows_per_table):
+            amount = round(rng.uniform(-500, 500), 2)
+            balance = round(balance + amount, 2)
+            rows.append([
+                f"2024-{page_num % 12 + 1:02d}-{row_index % 28 + 1:02d}",
+                f"{rng.choice(DESCRIPTIONS)} {rng.randrange(10000):04d}",
+                f"{amount:.2f}",
+                f"{balance:.2f}",
+            ])
+
+        top = 110
+        for line_index, row in enumerate([COLUMNS] + rows):
+            y = top + line_index * ROW_HEIGHT
+            for x, value in zip(COLUMN_X, row):
+                page.insert_text((x + 4, y + 13), value, fontsize=10)
+        bottom = top + (len(rows) + 1) * ROW_HEIGHT
+        for line_index in range(len(rows) + 2):
+            y = top + line_index * ROW_HEIGHT
+            page.draw_line((COLUMN_X[0], y), (COLUMN_X[-1], y), color=(0, 0, 0), width=0.5)
+        for x in COLUMN_X:
+            page.draw_line((x, top), (x, bottom), color=(0, 0, 0), width=0.5)
+
+        page.insert_text((50, bottom + 30), "PRIMARY KEY (TRN_ID)", fontsize=9)
+        page.insert_text((50, bottom + 44), "CONSTRAINT FK_ACCOUNT REFERENCES ACCOUNTS", fontsize=9)
+        truth.append({"page": page_num + 1, "columns": list(COLUMNS), "rows": rows})
+
+    doc.save(path)
+    doc.close()
+    return truth
+
+
+def _contains_in_order(text, values, start=0):
+    # Position after the last value if all values occur in this order, else None
+    for value in values:
+        position = text.find(value, start)
+        if position == -1:
+            return None
+        start = position + len(value)
+    return start
+
+
+def _score_text(output_path, truth):
+    # Sections start with "Page N:"; a row counts if its cells appear in order in its page's section
+    with open(output_path, encoding="utf-8") as f:
+        sections = f.read().split("\nPage ")
+    by_page = {}
+    for section in sections[1:]:
+        number, _, text = section.partition(":")
+        by_page[int(number)] = text
+
+    found = sum(
+        _contains_in_order(by_page.get(table["page"], ""), row) is not None
+        for table in truth for row in table["rows"]
+    )
+    return found, len(by_page)
+
+
+def _score_pdf(output_path, truth):
+    # Output pages follow the table pages in order; their text is scanned for the rows in sequence
+    with fitz.open(output_path) as doc:
+        text = "\n".join(page.get_text(clip=page.rect) for page in doc)
+        output_pages = doc.page_count
+
+    found = 0
+    position = 0
+    for table in truth:
+        for row in table["rows"]:
+            end = _contains_in_order(text, row, position)
+            if end is not None:
+                found += 1
+                position = end
+    return found, output_pages
+
+
+def _score_jsonl_rows(output_path, truth):
+    # A row counts if a record on its page has exactly its cells under the right columns
+    expected = {
+        (table["page"], tuple(zip(table["columns"], row)))
+        for table in truth for row in table["rows"]
+    }
+    found = 0
+    pages = set()
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            pages.add(record["page"])
+            if (record["page"], tuple(record["cells"].items())) in expected:
+                found += 1
+    return found, len(pages)
+
+
+def score_output(name, output_path, truth):
+    """
+    Scores one strategy's output against the ground truth.
+
+    Text and vector crops are searched for every row's cells; JSON outputs
+    must reproduce each row exactly on the right page. Raster crops hold no
+    text, so they are scored on table pages only.
+
+    Returns:
+        dict: row_recall (None for raster crops) and page_recall, both 0..1,
+        plus extra_pages: output pages or tables beyond the expected ones.
+    """
+    expected_rows = sum(len(table["rows"]) for table in truth)
+    if not os.path.exists(output_path):
+        return {"row_recall": 0.0 if expected_rows else None, "page_recall": 0.0 if truth else None, "extra_pages": 0}
+
+    _, suffix, options = STRATEGIES[name]
+    if suffix == ".txt":
+        found, pages = _score_text(output_path, truth)
+    elif suffix == ".jsonl":
+        found, pages = _score_jsonl_rows(output_path, truth)
+    elif options.get("mode") == "raster":
+        with fitz.open(output_path) as doc:
+            found, pages = None, doc.page_count
+    else:
+        found, pages = _score_pdf(output_path, truth)
+
+    return {
+        "row_recall": None if found is None or not expected_rows else round(found / expected_rows, 4),
+        "page_recall": round(min(pages, len(truth)) / len(truth), 4) if truth else None,
+        "extra_pages": max(0, pages - len(truth)),
+    }
+
+
+def _peak_rss_mb():
+    # On Linux ru_maxrss survives fork and exec, so a child would report its parent's
+    # peak; the high-water mark in /proc starts over with the new process image
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux and the BSDs, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_one(strategy, input_path, output_path, options):
+    # Runs in a fresh process, so the peak RSS belongs to this strategy alone
+    extract = load_strategy(strategy)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract(input_path, output_path, **options)
+    seconds = time.perf_counter() - start
+    return seconds, _peak_rss_mb()
+
+
+def run_benchmark(input_pdf_path, truth, output_dir, strategies=None, repeat=1):
+    """
+    Runs each strategy on one PDF and measures speed, memory, output size
+    and accuracy.
+
+    Every run happens in a newly spawned process, so imports and caches of
+    one strategy do not affect the next, and peak RSS is the run's own.
+    With repeat > 1 the fastest run is kept.
+
+    Args:
+        input_pdf_path (str): The PDF to extract from, e.g. from make_statement_pdf.
+        truth (list): Its ground truth, as returned by make_statement_pdf.
+        output_dir (str): Where outputs go, named <strategy><suffix>.
+        strategies (list, optional): Names from STRATEGIES; defaults to all.
+        repeat (int): Runs per strategy.
+
+    Returns:
+        list[dict]: One result per strategy with seconds, pages_per_s,
+        peak_rss_mb, output_bytes, row_recall, page_recall and extra_pages.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with fitz.open(input_pdf_path) as doc:
+        page_count = doc.page_count
+
+    results = []
+    spawn = multiprocessing.get_context("spawn")
+    for name in strategies or STRATEGIES:
+        strategy, suffix, options = STRATEGIES[name]
+        output_path = os.path.join(output_dir, name + suffix)
+        runs = []
+        for _ in range(repeat):
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                runs.append(executor.submit(_run_one, strategy, input_path=input_pdf_path, output_path=output_path, options=options).result())
+        seconds, peak_rss_mb = min(runs)
+
+        result = {
+            "strategy": name,
+            "seconds": round(seconds, 4),
+            "pages_per_s": round(page_count / seconds, 1) if seconds else None,
+            "peak_rss_mb": peak_rss_mb,
+            "output_bytes": os.path.getsize(output_path) if os.path.exists(output_path) else None,
+        }
+        result.update(score_output(name, output_path, truth))
+        results.append(result)
+    return results
+
+
+def print_results(results):
+    columns = ["strategy", "pages_per_s", "peak_rss_mb", "output_bytes", "row_recall", "page_recall", "extra_pages"]
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extraction strategies on a synthetic statement PDF.")
+    parser.add_argument("output_dir", help="Directory for the generated PDF, outputs and results")
+    parser.add_argument("--pages", type=int, default=50, help="Pages in the synthetic statement")
+    parser.add_argument("--density", type=float, default=0.5, help="Share of pages with a table (0..1)")
+    parser.add_argument("--rows", type=int, default=12, help="Data rows per table")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic statement")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="Comma-separated strategy names")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per strategy; the fastest is kept")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.strategies.split(",") if name.strip()]
+    unknown = [name for name in names if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(unknown)} (choose from {', '.join(STRATEGIES)})")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    input_pdf = os.path.join(args.output_dir, "statement.pdf")
+    truth = make_statement_pdf(input_pdf, pages=args.pages, table_density=args.density, rows_per_table=args.rows, seed=args.seed)
+    print(f"🔎 {args.pages} page(s), {len(truth)} with a table: {input_pdf}")
+
+    results = run_benchmark(input_pdf, truth, args.output_dir, strategies=names, repeat=args.repeat)
+    print_results(results)
+
+    # Kept next to the outputs, so runs before and after a change can be compared
+    results_path = os.path.join(args.output_dir, "results.json")
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "pages": args.pages, "density": args.density, "rows": args.rows, "seed": args.seed,
+            "results": results,
+        }, f, indent=4)
+    print(f"✅ Results saved to: {results_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import fitz  # PyMuPDF
+import json
+import os
+from document_pool import open_document, pdf_input
+from itertools import accumulate
+from jsonl_output import table_lines
+from result_cache import cache_key, cached_page_result, function_fingerprint, page_digest
+from table_crop import build_table_pages
+
+# The checkpoint of an output file lives next to it as <output><CHECKPOINT_SUFFIX>
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+
+def load_checkpoint(output_path, key):
+    """
+    The checkpoint recorded for `output_path`, or None if there is none or it
+    was written for different extraction settings (`key`).
+    """
+    try:
+        with open(output_path + CHECKPOINT_SUFFIX, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return checkpoint if checkpoint.get("key") == key else None
+
+
+def save_checkpoint(output_path, checkpoint):
+    # Written to a temporary file first, so an interrupted run never leaves a torn checkpoint
+    path = output_path + CHECKPOINT_SUFFIX
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+def _copy_range(src, dst, start, end):
+    # Copies bytes [start, end) of file `src` to `dst` in 1 MiB chunks
+    src.seek(start)
+    while start < end:
+        chunk = src.read(min(1 << 20, end - start))
+        if not chunk:
+            raise ValueError("Output file is shorter than its checkpoint")
+        dst.write(chunk)
+        start += len(chunk)
+
+
+def changed_pages(old_digests, digests):
+    """Page numbers whose digest is new or differs from the previous run's."""
+    return [
+        page_num for page_num, digest in enumerate(digests)
+        if page_num >= len(old_digests) or old_digests[page_num] != digest
+    ]
+
+
+def update_jsonl_output(input_pdf_path, output_path, parse_page, records="table", cache=None):
+    """
+    Brings a JSON Lines output up to date with a document that has grown or
+    changed since the last run, reprocessing only new and changed pages.
+
+    The checkpoint stores the page count, every page's content digest and
+    the byte range each page's records occupy in the output. The records of
+    pages before the first changed one stay as they are.
+
+    When every page from the first changed one on is new, changed or gone
+    (pages appended to a document, or its last pages edited or removed),
+    the output is truncated there and the new records are appended in
+    place, so the cost follows the size of the change. Otherwise, when an
+    unchanged page follows a changed one, the whole output is rewritten: a
+    new file gets the kept prefix, the copied records of unchanged pages and
+    the parsed changed ones, and replaces the old file once complete. That
+    copies every unchanged record, so it costs time in proportion to the
+    whole output, but only the changed pages are parsed. Without a usable
+    checkpoint the output is rebuilt from scratch.
+
+    Args:
+        input_pdf_path (str): The path to the input PDF file.
+        output_path (str): The JSON Lines file to create or update.
+        parse_page (callable): Returns {header: [values...]} or None for (page_num, page).
+        records (str): "table" or "row" records, as in JsonLinesWriter.
+        cache (ResultCache, optional): Persistent cache of parsed pages.
+
+    Returns:
+        tuple: (pages processed, tables in the output)
+    """
+    params = function_fingerprint(parse_page)
+    key = cache_key("jsonl", params, records)
+    checkpoint = load_checkpoint(output_path, key) if os.path.exists(output_path) else None
+    old_digests = checkpoint["digests"] if checkpoint else []
+    old_ranges = checkpoint["ranges"] if checkpoint else []
+
+    doc, owned = open_document(input_pdf_path)
+    try:
+        digests = [page_digest(doc, doc.load_page(page_num)) for page_num in range(len(doc))]
+        changed = set(changed_pages(old_digests, digests))
+        if not changed and len(digests) == len(old_digests):
+            return 0, checkpoint["tables"]
+
+        # Everything before the first changed page is kept in one piece
+        first_changed = min(changed) if changed else len(digests)
+        keep_bytes = old_ranges[first_changed][0] if first_changed < len(old_ranges) else (old_ranges[-1][1] if old_ranges else 0)
+        ranges = old_ranges[:first_changed]
+        tables = sum(1 for start, end in ranges if end > start)
+        # Old pages after the first change whose records are still good
+        reused = [page_num for page_num in range(first_changed, min(len(old_ranges), len(digests))) if page_num not in changed]
+
+        def write_pages(old, f):
+            nonlocal tables
+            for page_num in range(first_changed, len(digests)):
+                start = f.tell()
+                if page_num < len(old_ranges) and page_num not in changed:
+                    # Records of unchanged pages after the first change are copied, not re-parsed
+                    _copy_range(old, f, *old_ranges[page_num])
+                else:
+                    page = doc.load_page(page_num)
+                    table_data = cached_page_result(cache, doc, page, params, lambda: parse_page(page_num, page))
+                    if table_data:
+                        f.write(table_lines(page_num, 0, table_data, records).encode("utf-8"))
+                ranges.append([start, f.tell()])
+                tables += f.tell() > start
+
+        if checkpoint and not reused:
+            if os.path.getsize(output_path) < keep_bytes:
+                raise ValueError("Output file is shorter than its checkpoint")
+            # The old checkpoint goes first: a crash before the new one is saved then means a full rebuild
+            os.remove(output_path + CHECKPOINT_SUFFIX)
+            with open(output_path, "r+b") as f:
+                f.truncate(keep_bytes)
+                f.seek(keep_bytes)
+                write_pages(None, f)
+        else:
+            # The new output is written next to the old one and replaced in one step, so an
+            # interrupted run leaves the old output and its checkpoint consistent
+            tmp_path = output_path + ".tmp"
+            try:
+                with open(output_path if checkpoint else os.devnull, "rb") as old, open(tmp_path, "wb") as f:
+                    _copy_range(old, f, 0, keep_bytes)
+                    write_pages(old, f)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            if checkpoint:
+                os.remove(output_path + CHECKPOINT_SUFFIX)
+            os.replace(tmp_path, output_path)
+    finally:
+        if owned:
+            doc.close()
+
+    save_checkpoint(output_path, {"key": key, "page_count": len(digests), "digests": digests, "ranges": ranges, "tables": tables})
+    return len(changed), tables
+
+
+def update_table_pdf(input_pdf_path, output_pdf_path, find_table_rect, layout_table_page, workers=1, dpi=300, mode="raster", cache=None, render_policy=None,
+                     render_cache=None):
+    """
+    Brings a table-crop PDF up to date with a document that has grown or
+    changed since the last run, reprocessing only new and changed pages.
+
+    The checkpoint stores the page count, every page's content digest and
+    how many output pages each source page produced. Output pages of
+    changed or removed source pages are deleted, the changed pages are
+    cropped again and moved into place, and the result is written as an
+    incremental update appended to the existing output file. Without a
+    usable checkpoint the output is rebuilt from scratch.
+
+    Args:
+        input_pdf_path (str): The path to the input PDF file.
+        output_pdf_path (str): The PDF to create or update.
+        find_table_rect, layout_table_page, workers, dpi, mode, cache, render_policy,
+        render_cache:
+            As in table_crop.build_table_pages.
+
+    Returns:
+        tuple: (pages processed, output page count)
+    """
+    key = cache_key(
+        "pdf", function_fingerprint(find_table_rect), function_fingerprint(layout_table_page), dpi, mode,
+        vars(render_policy) if render_policy is not None else None,
+    )
+    checkpoint = load_checkpoint(output_pdf_path, key)
+    # A run that found nothing saved no PDF; that checkpoint is still good
+    if checkpoint and not os.path.exists(output_pdf_path) and sum(checkpoint["output_pages"]):
+        checkpoint = None
+    old_digests = checkpoint["digests"] if checkpoint else []
+    old_counts = checkpoint["output_pages"] if checkpoint else []
+
+    # A stream is read once, then reused for cropping
+    with pdf_input(input_pdf_path) as input_pdf_path:
+        doc, owned = open_document(input_pdf_path)
+        digests = [page_digest(doc, doc.load_page(page_num)) for page_num in range(len(doc))]
+        if owned:
+            doc.close()
+        changed = changed_pages(old_digests, digests)
+        if not changed and len(digests) == len(old_digests):
+            return 0, sum(old_counts)
+
+        opened_from_file = checkpoint is not None and os.path.exists(output_pdf_path)
+        output_doc = fitz.open(output_pdf_path) if opened_from_file else fitz.open()
+
+        # Delete the output pages of changed and removed source pages, last first
+        starts = [0, *accumulate(old_counts)]
+        changed_set = set(changed)
+        for page_num in reversed(range(len(old_counts))):
+            if (page_num in changed_set or page_num >= len(digests)) and old_counts[page_num]:
+                output_doc.delete_pages(starts[page_num], starts[page_num] + old_counts[page_num] - 1)
+
+        # Crop the changed pages; layout appends their output pages at the end
+        counts = old_counts[:len(digests)] + [0] * max(0, len(digests) - len(old_counts))
+        for page_num in changed:
+            counts[page_num] = 0
+
+        def counting_layout(output_doc, page_num, page_rect, table_rect):
+            counts[page_num] += 1
+            return layout_table_page(output_doc, page_num, page_rect, table_rect)
+
+        appended_from = output_doc.page_count
+        build_table_pages(
+            input_pdf_path, output_doc, find_table_rect, counting_layout,
+            workers=workers, dpi=dpi, mode=mode, cache=cache, pages=changed, render_policy=render_policy,
+            render_cache=render_cache,
+        )
+
+    # Move the new pages to their source page's position; targets ascend, so
+    # each move leaves the pages still waiting at the end where they were
+    targets = [0, *accumulate(counts)]
+    new_index = appended_from
+    for page_num in changed:
+        target = targets[page_num]
+        for offset in range(counts[page_num]):
+            if new_index != target + offset:
+                output_doc.move_page(new_index, target + offset)
+            new_index += 1
+
+    if output_doc.page_count == 0:
+        if os.path.exists(output_pdf_path):
+            os.remove(output_pdf_path)
+    elif opened_from_file and output_doc.can_save_incrementally():
+        output_doc.saveIncr()
+    elif opened_from_file:
+        output_doc.save(output_pdf_path + ".tmp")
+        output_doc.close()
+        os.replace(output_pdf_path + ".tmp", output_pdf_path)
+    else:
+        output_doc.save(output_pdf_path)
+    page_count = sum(counts)
+    if not output_doc.is_closed:
+        output_doc.close()
+
+    save_checkpoint(output_pdf_path, {"key": key, "page_count": len(digests), "digests": digests, "output_pages": counts})
+    return len(changed), page_count
@@ -0,0 +1,89 @@
+from bisect import bisect_right
+from statistics import median
+
+
+def group_rows(words):
+    """
+    Groups word tuples (x0, y0, x1, y1, text, ...) into table rows, top to
+    bottom. A word starts a new row once its vertical middle lies below every
+    word of the current row. Each row is sorted left to right.
+    """
+    rows = []
+    row_bottom = None
+    for word in sorted(words, key=lambda w: (w[1], w[0])):
+        middle = (word[1] + word[3]) / 2
+        if row_bottom is None or middle > row_bottom:
+            rows.append([])
+            row_bottom = word[3]
+        rows[-1].append(word)
+        row_bottom = max(row_bottom, word[3])
+    return [sorted(row, key=lambda w: w[0]) for row in rows]
+
+
+def column_boundaries(words, min_gap=None):
+    """
+    Finds column boundaries from the projection profile of all word boxes
+    on the x axis: every horizontal gap no word covers that is at least
+    `min_gap` wide separates two columns.
+
+    `min_gap` defaults to half the median word height, about two spaces,
+    the same separation the old two-spaces split relied on.
+
+    Returns:
+        list[float]: The x position in the middle of each gap, left to right.
+    """
+    if not words:
+        return []
+    if min_gap is None:
+        min_gap = median(w[3] - w[1] for w in words) / 2
+
+    boundaries = []
+    spans = sorted((w[0], w[2]) for w in words)
+    covered_to = spans[0][1]
+    for x0, x1 in spans[1:]:
+        if x0 - covered_to >= min_gap:
+            boundaries.append((covered_to + x0) / 2)
+        covered_to = max(covered_to, x1)
+    return boundaries
+
+
+def _cells(row, boundaries):
+    # Words go to the column their horizontal middle falls in
+    cells = [[] for _ in range(len(boundaries) + 1)]
+    for word in row:
+        cells[bisect_right(boundaries, (word[0] + word[2]) / 2)].append(word[4])
+    return [" ".join(cell) for cell in cells]
+
+
+def segment_table(words, min_gap=None):
+    """
+    Splits the words of a table region into a header row and data rows.
+
+    Column boundaries are computed once for the whole table from the word
+    x-coordinates of all rows, and every word is assigned to its cell by a
+    binary search over them. The first row is the header; a column without
+    a header word is merged into its left neighbour. Cells without words
+    stay as empty strings, so rows with missing values are kept.
+
+    Args:
+        words (list): Word tuples (x0, y0, x1, y1, text, ...) inside the table region.
+        min_gap (float, optional): Narrowest gap that separates two columns.
+
+    Returns:
+        tuple | None: (headers, rows) with every row as long as headers, or None
+        if there are no words.
+    """
+    rows = group_rows(words)
+    if not rows:
+        return None
+
+    boundaries = column_boundaries(words, min_gap)
+
+    # Columns are defined by the header: drop boundaries in front of unnamed columns
+    header_cells = _cells(rows[0], boundaries)
+    boundaries = [
+        boundary for boundary, header in zip(boundaries, header_cells[1:]) if header
+    ]
+
+    headers = _cells(rows[0], boundaries)
+    return headers, [_cells(row, boundaries) for row in rows[1:]]
@@ -0,0 +1,220 @@
+import os
+import re
+from datetime import datetime
+
+# Date layouts recognised for date32 columns
+DATE_FORMATS = ("%Y-%m-%d", "%d %b %Y", "%d-%b-%Y", "%d %B %Y")
+
+# Optional sign and currency sign, thousands separators; accounting negatives
+# are written in matching parentheses, e.g. "(12.00)"
+_NUMBER = r"-?[$€£]?\s*\d[\d,]*(?:\.\d+)?"
+NUMBER_PATTERN = re.compile(rf"^(?:{_NUMBER}|\({_NUMBER}\))$")
+
+# Rows buffered per row group when the caller does not choose
+DEFAULT_BATCH_ROWS = 65536
+
+# Provenance columns that come before the table's own columns
+PROVENANCE_COLUMNS = ("page", "table", "row")
+
+
+def parse_number(value):
+    """Returns a float for numeric-looking cells such as '1,204.50' or '(12.00)', else None."""
+    text = value.strip()
+    if not text or not NUMBER_PATTERN.match(text):
+        return None
+    number = float(re.sub(r"[^\d.\-]", "", text))
+    return -number if text.startswith("(") else number
+
+
+def parse_date(value):
+    """Returns a date for cells in one of DATE_FORMATS, else None."""
+    text = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _is_blank(value):
+    return value is None or not value.strip()
+
+
+def _column_name(header):
+    # A header that clashes with a provenance column keeps its text with a trailing "_"
+    return header + "_" if header in PROVENANCE_COLUMNS else header
+
+
+class ColumnarTableWriter:
+    """
+    Writes parsed tables to a Parquet or Arrow IPC file with typed columns.
+
+    Every table row becomes one row of the file: the provenance columns
+
+        page (int32, 1-based), table (int32), row (int32)
+
+    followed by one column per table header. A column is float64 when all
+    its non-empty cells are numbers (see parse_number), date32 when they are
+    all dates (see parse_date), and a string otherwise; empty cells are null.
+    The schema is the union of the headers in the first row group, so tables
+    with fewer columns fill the others with nulls.
+
+    Tables are buffered and written as one row group once at least
+    `batch_rows` rows are pending, and at close(). A large batch keeps the
+    file small and fast to scan (typically a whole statement in one row
+    group); a small one bounds memory on very large documents at the cost
+    of more row groups and a bigger file. Both formats write their footer
+    at close(), so the file can only be read once the writer is closed.
+
+    A later row group that does not fit the schema (a new header, or a cell
+    that does not parse as its column's type) starts a new part file with
+    its own schema: <output stem>.1<ext>, <output stem>.2<ext>, ... All
+    files written are listed in `paths`.
+
+    pyarrow is only needed when a writer is created.
+
+    Args:
+        output_path (str): The path to the output file.
+        file_format (str): "parquet" or "arrow" (Arrow IPC file).
+        batch_rows (int): Rows per row group.
+    """
+
+    def __init__(self, output_path, file_format="parquet", batch_rows=DEFAULT_BATCH_ROWS):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Columnar output needs pyarrow: pip install pyarrow") from None
+
+        if file_format not in ("parquet", "arrow"):
+            raise ValueError(f"Unknown columnar format: {file_format!r}")
+
+        self._pa = pa
+        self.output_path = output_path
+        self.file_format = file_format
+        self.batch_rows = batch_rows
+        self.tables_written = 0
+        self.paths = []
+        self.schema = None
+        self._writer = None
+        self._tables = []
+        self._pending_rows = 0
+
+    def write_table(self, page_num, table_index, table_data):
+        """
+        Buffers one parsed table, flushing a row group once enough rows are pending.
+
+        Args:
+            page_num (int): The zero-based page number the table was found on.
+            table_index (int): The table's index within the page.
+            table_data (dict): The table as {header: [values...]}.
+        """
+        self._tables.append((page_num + 1, table_index, table_data))
+        self._pending_rows += max(map(len, table_data.values()), default=0)
+        self.tables_written += 1
+        if self._pending_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._tables:
+            return
+        columns = self._pending_columns()
+        if self.schema is None or not self._fits(columns):
+            self._open_part(self._infer_schema(columns))
+
+        row_count = len(columns["page"])
+        arrays = [
+            self._pa.array(self._convert(columns.get(field.name, [None] * row_count), field.type), type=field.type)
+            for field in self.schema
+        ]
+        self._writer.write(self._pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._tables = []
+        self._pending_rows = 0
+
+    def _pending_columns(self):
+        # The buffered tables as {column: [cells...]}, every column as long as the page column
+        columns = {name: [] for name in PROVENANCE_COLUMNS}
+        for page, table_index, table_data in self._tables:
+            start = len(columns["page"])
+            row_count = max(map(len, table_data.values()), default=0)
+            columns["page"].extend([page] * row_count)
+            columns["table"].extend([table_index] * row_count)
+            columns["row"].extend(range(row_count))
+            for header, values in table_data.items():
+                column = columns.setdefault(_column_name(header), [])
+                column.extend([None] * (start - len(column)))
+                column.extend(values)
+        for column in columns.values():
+            column.extend([None] * (len(columns["page"]) - len(column)))
+        return columns
+
+    def _infer_schema(self, columns):
+        pa = self._pa
+        fields = [(name, pa.int32()) for name in PROVENANCE_COLUMNS]
+        for name, values in columns.items():
+            if name in PROVENANCE_COLUMNS:
+                continue
+            cells = [value for value in values if not _is_blank(value)]
+            if cells and all(parse_number(value) is not None for value in cells):
+                fields.append((name, pa.float64()))
+            elif cells and all(parse_date(value) is not None for value in cells):
+                fields.append((name, pa.date32()))
+            else:
+                fields.append((name, pa.string()))
+        return pa.schema(fields)
+
+    def _fits(self, columns):
+        # Every column is in the schema and every cell parses as its column's type
+        for name, values in columns.items():
+            if self.schema.get_field_index(name) < 0:
+                return False
+            parse = self._parser(self.schema.field(name).type)
+            if parse is not None and any(not _is_blank(value) and parse(value) is None for value in values):
+                return False
+        return True
+
+    def _parser(self, field_type):
+        if field_type == self._pa.float64():
+            return parse_number
+        if field_type == self._pa.date32():
+            return parse_date
+        return None
+
+    def _convert(self, values, field_type):
+        parse = self._parser(field_type)
+        if parse is None:
+            return values
+        return [None if _is_blank(value) else parse(value) for value in values]
+
+    def _open_part(self, schema):
+        if self._writer is not None:
+            self._writer.close()
+        path = self.output_path
+        if self.paths:
+            stem, ext = os.path.splitext(self.output_path)
+            path = f"{stem}.{len(self.paths)}{ext}"
+
+        if self.file_format == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+        else:
+            options = self._pa.ipc.IpcWriteOptions(compression="zstd")
+            self._writer = self._pa.ipc.new_file(path, schema, options=options)
+        self.schema = schema
+        self.paths.append(path)
+
+    def close(self):
+        try:
+            self.flush()
+            if self._writer is None:
+                # Nothing found: the output still exists, with the provenance columns only
+                self._open_part(self._infer_schema({name: [] for name in PROVENANCE_COLUMNS}))
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
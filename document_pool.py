@@ -0,0 +1,218 @@
+import fitz  # PyMuPDF
+import contextlib
+import io
+import mmap
+import os
+from collections import OrderedDict
+from instrumentation import metrics
+
+
+def pdf_source(source):
+    """
+    Normalises a PDF input for the readers without copying it.
+
+    Returns (source, mapping). Paths and open fitz.Documents are returned
+    unchanged. Everything else is turned into a buffer MuPDF reads in place:
+    - bytes and byte memoryviews are returned as is;
+    - bytearray, other memoryviews and mmap objects become a byte memoryview;
+    - an io.BytesIO exposes its buffer;
+    - a file object backed by a real file is memory-mapped, whatever its position.
+    Any other stream (e.g. a network response) is read once; that is the only
+    case that copies the document into Python bytes.
+
+    `mapping` is the memory map made for a file object, else None. The caller
+    owns it: once every document and file opened from `source` is closed,
+    release_source(source, mapping) unmaps it. pdf_input does both for a
+    with block.
+    """
+    if isinstance(source, (str, os.PathLike, fitz.Document, bytes)):
+        return source, None
+    if isinstance(source, memoryview) and source.format == "B" and source.ndim == 1:
+        # No new view, so releasing the caller's view is enough to unmap what it reads
+        return source, None
+    if isinstance(source, (bytearray, memoryview, mmap.mmap)):
+        return memoryview(source).cast("B"), None
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer(), None
+
+    try:
+        fileno = source.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fileno = None
+    if fileno is not None:
+        mapping = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        return memoryview(mapping), mapping
+    return source.read(), None
+
+
+def release_source(source, mapping):
+    """
+    Unmaps the memory map pdf_source made for `source`; does nothing if
+    `mapping` is None. Close the documents and files read from it first.
+    """
+    if mapping is not None:
+        source.release()
+        mapping.close()
+
+
+@contextlib.contextmanager
+def pdf_input(source):
+    """
+    pdf_source(source) for the length of a with block, for code that reads
+    one input several times:
+
+        with pdf_input(stream) as source:
+            doc, owned = open_document(source)
+            ...
+
+    A memory map made for a file object is closed on exit.
+    """
+    source, mapping = pdf_source(source)
+    try:
+        yield source
+    finally:
+        release_source(source, mapping)
+
+
+class _MappedDocument(fitz.Document):
+    # A document read from a memory map open_document made; closing it unmaps the file
+    def __init__(self, view, mapping):
+        super().__init__(stream=view, filetype="pdf")
+        self._mapping = mapping
+
+    def close(self):
+        super().close()
+        release_source(self.stream, self._mapping)
+
+
+def open_document(source):
+    """
+    Opens `source` for reading and returns (doc, owned).
+
+    `source` is a path, an already open fitz.Document, or any bytes-like,
+    memory-mapped or file-like input accepted by pdf_source, which MuPDF
+    then reads from memory without a temporary file. A document passed in
+    is used as is and owned stays False, so the caller that opened it (for
+    example a DocumentPool) keeps control of when it is closed. A memory map
+    made for a file object belongs to the document and is closed with it.
+    """
+    source, mapping = pdf_source(source)
+    if isinstance(source, fitz.Document):
+        return source, False
+    with metrics.stage("open"):
+        if isinstance(source, (str, os.PathLike)):
+            return fitz.open(source), True
+        if mapping is not None:
+            try:
+                return _MappedDocument(source, mapping), True
+            except Exception:
+                release_source(source, mapping)
+                raise
+        return fitz.open(stream=source, filetype="pdf"), True
+
+
+class _BufferFile(io.RawIOBase):
+    # Read-only, seekable file over a buffer; reads copy only the requested bytes
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        data = self._buffer[self._position:self._position + len(target)]
+        target[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._buffer)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._buffer.release()
+        super().close()
+
+
+@contextlib.contextmanager
+def pdf_file(source):
+    """
+    `source` as something pdfplumber and PyPDF2 can open, for the length of
+    a with block: a path, or a seekable binary file reading straight from
+    the caller's buffer.
+
+        with pdf_file(source) as f, pdfplumber.open(f) as pdf:
+            ...
+
+    The file, and a memory map made for a file object, are closed on exit.
+    """
+    with pdf_input(source) as source:
+        if isinstance(source, fitz.Document):
+            source = document_path(source) or source.tobytes()
+        if isinstance(source, (str, os.PathLike)):
+            yield source
+            return
+        with io.BufferedReader(_BufferFile(memoryview(source))) as f:
+            yield f
+
+
+def document_path(source):
+    """The file path behind `source`, or None if it has no file on disk."""
+    if isinstance(source, fitz.Document):
+        source = source.name
+    if isinstance(source, (str, os.PathLike)) and source and os.path.isfile(source):
+        return os.fspath(source)
+    return None
+
+
+class DocumentPool:
+    """
+    Keeps recently used documents open so repeat requests skip fitz.open.
+
+    Documents are keyed by path, modification time and size, so a file that
+    changes on disk is reopened rather than served stale. When more than
+    `max_documents` are open, the least recently used one is closed.
+
+    PyMuPDF is not thread-safe; use one pool per process (or per thread that
+    owns all of its documents).
+
+    Args:
+        max_documents (int): How many documents to keep open at most.
+    """
+
+    def __init__(self, max_documents=32):
+        self.max_documents = max_documents
+        self._documents = OrderedDict()
+
+    def get(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+        doc = self._documents.get(key)
+        if doc is not None:
+            self._documents.move_to_end(key)
+            return doc
+
+        doc = fitz.open(path)
+        self._documents[key] = doc
+        while len(self._documents) > self.max_documents:
+            _, evicted = self._documents.popitem(last=False)
+            evicted.close()
+        return doc
+
+    def __len__(self):
+        return len(self._documents)
+
+    def close(self):
+        for doc in self._documents.values():
+            doc.close()
+        self._documents.clear()
@@ -0,0 +1,170 @@
+import contextlib
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+# Shared by every stage() call while metrics are off, so a disabled stage allocates nothing
+_NO_STAGE = contextlib.nullcontext()
+
+
+class _Stage:
+    __slots__ = ("timers", "name", "start")
+
+    def __init__(self, timers, name):
+        self.timers = timers
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        timer = self.timers.get(self.name)
+        if timer is None:
+            self.timers[self.name] = [1, elapsed]
+        else:
+            timer[0] += 1
+            timer[1] += elapsed
+
+
+class Metrics:
+    """
+    Per-stage timers, counters and gauges for one process.
+
+    Extraction code wraps its expensive steps in `with metrics.stage(name):`
+    and reports volumes with `metrics.count(name, value)`. While disabled
+    (the default) stage() returns one shared no-op context manager and
+    count() returns at once, so instrumented code runs at full speed.
+
+    Stages can nest; a stage's time includes the stages inside it (e.g.
+    "detect" includes the "get_text" it triggers).
+
+    Stages:
+        open, header_band, get_text, detect, parse, get_pixmap, encode,
+        insert_image, show_pdf_page, save; in the pdfplumber readers
+        rule_search, header_search, find_tables
+    Counters:
+        pages_scanned, pages_matched, blocks_scanned, bytes_rendered, render_cache_hits
+
+    Args:
+        enabled (bool): Whether to record anything.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timers = {}  # stage -> [calls, seconds]
+        self.counters = {}
+        self.gauges = {}
+
+    def stage(self, name):
+        """Context manager that times one run of stage `name`."""
+        if not self.enabled:
+            return _NO_STAGE
+        return _Stage(self.timers, name)
+
+    def count(self, name, value=1):
+        """Adds `value` to counter `name`."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Sets gauge `name`, a value that is replaced rather than added to."""
+        if self.enabled:
+            self.gauges[name] = value
+
+    def reset(self):
+        self.timers.clear()
+        self.counters.clear()
+        self.gauges.clear()
+
+    def snapshot(self):
+        """Everything recorded so far as plain data, e.g. to send from a worker process."""
+        return {
+            "timers": {name: list(timer) for name, timer in self.timers.items()},
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+    def merge(self, snapshot):
+        """Adds a snapshot from another process to this one; gauges keep the larger value."""
+        if not snapshot:
+            return
+        for name, (calls, seconds) in snapshot["timers"].items():
+            timer = self.timers.setdefault(name, [0, 0.0])
+            timer[0] += calls
+            timer[1] += seconds
+        for name, value in snapshot["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        for name, value in snapshot["gauges"].items():
+            self.gauges[name] = max(value, self.gauges.get(name, value))
+
+    def prometheus_text(self, prefix="pdfreader"):
+        """
+        The metrics in the Prometheus text exposition format: stage timers as
+        <prefix>_stage_seconds_total and <prefix>_stage_calls_total with a
+        "stage" label, counters as <prefix>_<name>_total, gauges as <prefix>_<name>.
+        """
+        lines = []
+        if self.timers:
+            lines.append(f"# TYPE {prefix}_stage_seconds_total counter")
+            for name, (calls, seconds) in sorted(self.timers.items()):
+                lines.append(f'{prefix}_stage_seconds_total{{stage="{name}"}} {seconds:.6f}')
+            lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+            for name, (calls, seconds) in sorted(self.timers.items()):
+                lines.append(f'{prefix}_stage_calls_total{{stage="{name}"}} {calls}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+# The process-wide metrics the extraction code reports to; set metrics.enabled = True to record
+metrics = Metrics()
+
+
+@contextlib.contextmanager
+def profile(output_path=None, top=25):
+    """
+    Runs the block under cProfile. The stats are saved to `output_path` (for
+    pstats or snakeviz) when given, otherwise the `top` entries by cumulative
+    time are printed.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if output_path:
+            profiler.dump_stats(output_path)
+            print(f"✅ Profile saved to: {output_path}")
+        else:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+            print(stream.getvalue())
+
+
+@contextlib.contextmanager
+def trace_memory():
+    """
+    Traces Python allocations in the block with tracemalloc and records the
+    peak as the tracemalloc_peak_bytes gauge. MuPDF's own allocations (page
+    rendering, document buffers) are not seen by tracemalloc.
+    """
+    already_tracing = tracemalloc.is_tracing()
+    if already_tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if not already_tracing:
+            tracemalloc.stop()
+        metrics.set_gauge("tracemalloc_peak_bytes", peak)
@@ -0,0 +1,76 @@
+import json
+
+
+def table_records(page_num, table_index, table_data, records="table"):
+    """
+    Builds the JSON Lines records for one parsed table: a single table record,
+    or one record per row with records="row". See JsonLinesWriter for the schema.
+    """
+    columns = list(table_data)
+    rows = [list(row) for row in zip(*table_data.values())]
+
+    if records == "table":
+        return [{"page": page_num + 1, "table": table_index, "columns": columns, "rows": rows}]
+    return [
+        {"page": page_num + 1, "table": table_index, "row": row_index, "cells": dict(zip(columns, row))}
+        for row_index, row in enumerate(rows)
+    ]
+
+
+def table_lines(page_num, table_index, table_data, records="table"):
+    """The JSON Lines text for one parsed table, one record per line."""
+    return "".join(
+        json.dumps(record, ensure_ascii=False) + "\n"
+        for record in table_records(page_num, table_index, table_data, records)
+    )
+
+
+class JsonLinesWriter:
+    """
+    Streams parsed tables to a JSON Lines file, one record per line.
+
+    Every record is flushed as soon as it is written, so memory stays flat
+    and a consumer can start reading while extraction is still running.
+
+    Table records (records="table"):
+        {"page": 1, "table": 0, "columns": [...], "rows": [[...], ...]}
+    Row records (records="row"):
+        {"page": 1, "table": 0, "row": 0, "cells": {column: value, ...}}
+
+    `page` is 1-based, `table` and `row` are 0-based indexes within the page
+    and table. The schema is the same however many tables are found.
+
+    Args:
+        output_path (str): The path to the output JSON Lines file.
+        records (str): "table" for one record per table, "row" for one per row.
+    """
+
+    def __init__(self, output_path, records="table"):
+        if records not in ("table", "row"):
+            raise ValueError(f"Unknown record type: {records!r}")
+        self.output_path = output_path
+        self.records = records
+        self.tables_written = 0
+        self._file = open(output_path, "w", encoding="utf-8")
+
+    def write_table(self, page_num, table_index, table_data):
+        """
+        Writes one parsed table.
+
+        Args:
+            page_num (int): The zero-based page number the table was found on.
+            table_index (int): The table's index within the page.
+            table_data (dict): The table as {header: [values...]}.
+        """
+        self._file.write(table_lines(page_num, table_index, table_data, self.records))
+        self._file.flush()
+        self.tables_written += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
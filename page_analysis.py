@@ -0,0 +1,108 @@
+import fitz  # PyMuPDF
+from functools import cached_property
+from instrumentation import metrics
+from spatial_index import SpatialIndex
+
+
+class PageAnalysis:
+    """
+    Text of one page, extracted into a single MuPDF TextPage on first use.
+
+    Blocks, lines, words, spans and clipped text are all served from that
+    TextPage, so header detection, block collection and table parsing on the
+    same page pay for text extraction only once.
+
+    Args:
+        page (fitz.Page): The page to analyse.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.rect = page.rect
+
+    @cached_property
+    def textpage(self):
+        # Same flags page.get_text() uses for "text", "blocks" and "words"
+        with metrics.stage("get_text"):
+            return self.page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+
+    @cached_property
+    def blocks(self):
+        """Block tuples, as returned by page.get_text("blocks")."""
+        blocks = self.page.get_text("blocks", textpage=self.textpage)
+        metrics.count("blocks_scanned", len(blocks))
+        return blocks
+
+    @cached_property
+    def words(self):
+        """Word tuples, as returned by page.get_text("words")."""
+        return self.page.get_text("words", textpage=self.textpage)
+
+    @cached_property
+    def block_index(self):
+        """
+        SpatialIndex over the blocks, built on first use and shared by every
+        query on this page; worth it when a page is queried more than once.
+        """
+        return SpatialIndex(self.blocks)
+
+    @cached_property
+    def word_index(self):
+        """SpatialIndex over the words, like block_index."""
+        return SpatialIndex(self.words)
+
+    @cached_property
+    def text_dict(self):
+        """The nested block/line/span structure of page.get_text("dict")."""
+        return self.page.get_text("dict", textpage=self.textpage)
+
+    @cached_property
+    def lines(self):
+        """(bbox, text) for every text line, in reading order."""
+        return [
+            (line["bbox"], "".join(span["text"] for span in line["spans"]))
+            for block in self.text_dict["blocks"] if "lines" in block
+            for line in block["lines"]
+        ]
+
+    @cached_property
+    def spans(self):
+        """Every text span dict (text, size, font, bbox, ...), in reading order."""
+        return [
+            span
+            for block in self.text_dict["blocks"] if "lines" in block
+            for line in block["lines"]
+            for span in line["spans"]
+        ]
+
+    def header_band_contains(self, keywords, band_ratio):
+        """
+        Cheap pre-check for a header keyword in the top `band_ratio` of the page.
+
+        Only the band is extracted (or the cached TextPage is reused if the
+        page was already analysed), so pages without the keyword are rejected
+        before any full-page extraction. Matching ignores case, so a page the
+        full header check would accept is never rejected here.
+
+        Args:
+            keywords (str | list[str]): Keyword, or keywords of which any may match.
+            band_ratio (float): Height of the header band as a fraction of the page.
+        """
+        if isinstance(keywords, str):
+            keywords = [keywords]
+
+        band = fitz.Rect(0, 0, self.rect.width, self.rect.height * band_ratio)
+        if "textpage" in self.__dict__:
+            band_text = self.text(clip=band)
+        else:
+            with metrics.stage("header_band"):
+                band_text = self.page.get_text("text", clip=band, flags=fitz.TEXTFLAGS_TEXT)
+
+        band_text = band_text.upper()
+        return any(keyword.upper() in band_text for keyword in keywords)
+
+    def text(self, clip=None):
+        """Plain page text, or only the text inside `clip` when given."""
+        if clip is None:
+            return self.page.get_text("text", textpage=self.textpage)
+        return self.textpage.extractTextbox(fitz.Rect(clip))
@@ -0,0 +1,151 @@
+from array import array
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; plain array columns work without it
+    np = None
+
+# Ends every block's text in the buffer, so a search never matches across two blocks
+_SEPARATOR = "\x00"
+
+
+class BlockColumns:
+    """
+    Text blocks of one page in column form: four array('f') coordinate
+    columns and one text buffer with per-block offsets, in place of a dict
+    per block, line and span.
+
+    MuPDF computes coordinates in single precision, so float32 columns hold
+    them exactly. Text searches run over the whole buffer at once, and with
+    NumPy installed sorting, filtering and bounds are vectorised.
+
+    Build one with BlockColumns.from_textpage(analysis.textpage), which
+    reads MuPDF's block list directly and never builds the span dicts.
+    """
+
+    def __init__(self):
+        self.x0 = array("f")
+        self.y0 = array("f")
+        self.x1 = array("f")
+        self.y1 = array("f")
+        self.buffer = ""
+        self.offsets = array("L", [0])
+        self._lower = None  # (buffer, offsets) of the lowercased texts, built on first use
+
+    def _append(self, x0, y0, x1, y1, text):
+        self.x0.append(x0)
+        self.y0.append(y0)
+        self.x1.append(x1)
+        self.y1.append(y1)
+        self.offsets.append(self.offsets[-1] + len(text) + 1)
+        return text + _SEPARATOR
+
+    @classmethod
+    def from_textpage(cls, textpage, line_separator=" "):
+        """
+        Builds the columns from a fitz.TextPage, one row per text block, from
+        its block tuples rather than the dict tree. A block's text is its lines
+        joined with `line_separator` and stripped; image blocks are left out.
+        """
+        columns = cls()
+        texts = []
+        for x0, y0, x1, y1, text, _, block_type in textpage.extractBLOCKS():
+            if block_type != 0:
+                continue
+            texts.append(columns._append(x0, y0, x1, y1, line_separator.join(text.splitlines()).strip()))
+        columns.buffer = "".join(texts)
+        return columns
+
+    @classmethod
+    def from_text_dict(cls, text_dict, span_separator=" "):
+        """
+        Builds the columns from page.get_text("dict") output, one row per
+        text block. A block's text is its spans joined with `span_separator`
+        and stripped; image blocks are left out.
+        """
+        columns = cls()
+        texts = []
+        for block in text_dict["blocks"]:
+            if "lines" not in block:
+                continue
+            text = span_separator.join(span["text"] for line in block["lines"] for span in line["spans"]).strip()
+            texts.append(columns._append(*block["bbox"], text))
+        columns.buffer = "".join(texts)
+        return columns
+
+    def __len__(self):
+        return len(self.x0)
+
+    def text(self, index):
+        """The text of block `index`."""
+        return self.buffer[self.offsets[index]:self.offsets[index + 1] - 1]
+
+    def columns(self):
+        """(x0, y0, x1, y1) as NumPy arrays sharing memory with the columns (needs NumPy)."""
+        return tuple(np.frombuffer(column, dtype=np.float32) for column in (self.x0, self.y0, self.x1, self.y1))
+
+    def top_to_bottom(self, max_y1=None):
+        """
+        Block indexes sorted by top edge (ties in extraction order), only those
+        ending at or above `max_y1` when given.
+        """
+        if np is not None:
+            _, y0, _, y1 = self.columns()
+            order = np.argsort(y0, kind="stable")
+            if max_y1 is not None:
+                order = order[y1[order] <= max_y1]
+            return order.tolist()
+
+        order = sorted(range(len(self)), key=self.y0.__getitem__)
+        if max_y1 is not None:
+            order = [i for i in order if self.y1[i] <= max_y1]
+        return order
+
+    def containing(self, needle, ignore_case=True):
+        """The set of block indexes whose text contains `needle`."""
+        if ignore_case:
+            if self._lower is None:
+                self._lower = self._lowercased()
+            (buffer, offsets), needle = self._lower, needle.lower()
+        else:
+            buffer, offsets = self.buffer, self.offsets
+
+        indexes = set()
+        position = buffer.find(needle)
+        while position != -1:
+            index = bisect_right(offsets, position) - 1
+            indexes.add(index)
+            # Continue from the next block; one hit per block is enough
+            position = buffer.find(needle, offsets[index + 1])
+        return indexes
+
+    def _lowercased(self):
+        # Lowercased block by block with offsets of their own: lower() can change a
+        # string's length ("İ" becomes two characters), so the original offsets don't fit
+        texts = [self.text(index).lower() + _SEPARATOR for index in range(len(self))]
+        offsets = array("L", [0])
+        for text in texts:
+            offsets.append(offsets[-1] + len(text))
+        return "".join(texts), offsets
+
+    def containing_any(self, needles, ignore_case=True):
+        """The set of block indexes whose text contains any of `needles`."""
+        indexes = set()
+        for needle in needles:
+            indexes |= self.containing(needle, ignore_case)
+        return indexes
+
+    def bounds(self, indexes):
+        """The (x0, y0, x1, y1) bounding box of the given blocks."""
+        if np is not None:
+            x0, y0, x1, y1 = self.columns()
+            indexes = np.asarray(indexes, dtype=np.intp)
+            return (
+                float(x0[indexes].min()), float(y0[indexes].min()),
+                float(x1[indexes].max()), float(y1[indexes].max()),
+            )
+        return (
+            min(self.x0[i] for i in indexes), min(self.y0[i] for i in indexes),
+            max(self.x1[i] for i in indexes), max(self.y1[i] for i in indexes),
+        )
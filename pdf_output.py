@@ -0,0 +1,93 @@
+import fitz  # PyMuPDF
+import os
+import shutil
+import tempfile
+from instrumentation import metrics
+
+
+class ChunkedPdfWriter:
+    """
+    Output document that keeps at most `pages_per_chunk` new pages in memory.
+
+    It stands in for the `fitz.open()` output document of the cropping
+    scripts: layout code calls new_page() on it, and the scripts check
+    page_count, then call save() and close(). Once `pages_per_chunk` pages
+    have been added, they are appended to a file on disk as an incremental
+    update and the document is reopened from that file. The pages written so
+    far (with their embedded pixmaps) are then loaded lazily, only if needed,
+    so memory no longer grows with the number of matching pages.
+
+    Each reopen starts a new graft map, so vector pages (show_pdf_page) copy
+    the source's shared fonts and XObjects again in every chunk. save()
+    therefore writes the final file with garbage=3, which drops the objects
+    left unused by the incremental updates and merges duplicate objects;
+    that rewrite reads the spilled file object by object, so it does not
+    bring the pages back into memory. Streams are left as they are (no
+    deflate), as in a plain save of the non-chunked document.
+
+    Args:
+        pages_per_chunk (int): New pages kept in memory before they are written out.
+        spill_dir (str, optional): Where the document is built; defaults to the
+            system temporary directory.
+    """
+
+    def __init__(self, pages_per_chunk=32, spill_dir=None):
+        self.pages_per_chunk = pages_per_chunk
+        self._dir = tempfile.mkdtemp(prefix="pdf-chunks-", dir=spill_dir)
+        self._path = os.path.join(self._dir, "output.pdf")
+        self._doc = fitz.open()
+        self._written_pages = 0
+
+    @property
+    def page_count(self):
+        return self._doc.page_count
+
+    def __len__(self):
+        return self.page_count
+
+    def new_page(self, *args, **kwargs):
+        """fitz.Document.new_page, writing out the pending pages when the chunk is full."""
+        # Every pending page is finished by now: layout code only fills the newest page
+        if self._doc.page_count - self._written_pages >= self.pages_per_chunk:
+            self._spill()
+        return self._doc.new_page(*args, **kwargs)
+
+    def _spill(self):
+        if self._doc.page_count == self._written_pages:
+            return
+        with metrics.stage("save"):
+            if self._written_pages:
+                self._doc.saveIncr()
+            else:
+                self._doc.save(self._path)
+        self._doc.close()
+
+        # Reopened from disk, written pages cost nothing until they are accessed
+        self._doc = fitz.open(self._path)
+        self._written_pages = self._doc.page_count
+
+    def save(self, output_path):
+        """Writes every page so far to `output_path`, compacted; later pages are appended to it."""
+        if self._doc.page_count == 0:
+            raise ValueError("cannot save a document without pages")
+        self._spill()
+        if os.path.abspath(output_path) == os.path.abspath(self._path):
+            return  # Saved here before; the spill appended the new pages
+
+        with metrics.stage("save"):
+            self._doc.save(output_path, garbage=3)
+        self._doc.close()
+        if os.path.dirname(self._path) == self._dir:
+            os.remove(self._path)
+        self._path = output_path
+        self._doc = fitz.open(output_path)
+
+    def close(self):
+        self._doc.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,77 @@
+"""
+Transaction table extraction strategies as an importable library.
+
+Each strategy still lives in its readerN script. A script, and PyMuPDF,
+pdfplumber or PyPDF2 with it, is only imported the first time one of its
+names is accessed, so `import pdfreader` is cheap and has no side effects:
+
+    import pdfreader
+    pdfreader.extract_transaction_table_to_json("input.pdf", "tables.json")
+
+Names map to the latest variant of each strategy. Earlier variants stay
+reachable through `variant("reader12")`.
+"""
+import importlib
+import re
+
+# Public name -> "module:attribute" that implements it
+_EXPORTS = {
+    # Strategies
+    "extract_transactions_table": "reader:extract_transactions_table",
+    "extract_transaction_tables_to_pdf": "reader2:extract_transaction_tables_to_pdf",
+    "extract_transactions_above_line": "reader3:extract_transactions_above_line",
+    "extract_transactions_table_only": "reader4:extract_transactions_table_only",
+    "extract_transactions_table_preserved": "reader5:extract_transactions_table_preserved",
+    "copy_transaction_pages_exactly": "reader6:copy_transaction_pages_exactly",
+    "extract_table_only": "reader14:extract_table_only",
+    "extract_table_if_header_present": "reader15:extract_table_if_header_present",
+    "extract_transaction_table_region": "reader16:extract_transaction_table_region",
+    "extract_table_regions": "reader17:extract_table_regions",
+    "extract_transaction_table_to_json": "reader20:extract_transaction_table_to_json",
+    "extract_transaction_table_with_plumber": "reader22:extract_transaction_table_with_plumber",
+    # Async entry points
+    "aiter_page_tables": "async_extract:aiter_page_tables",
+    "aiter_table_regions": "async_extract:aiter_table_regions",
+    "extract_async": "async_extract:extract_async",
+    "extract_transaction_table_region_async": "async_extract:extract_transaction_table_region_async",
+    "extract_transaction_table_to_json_async": "async_extract:extract_transaction_table_to_json_async",
+    # Supporting pieces
+    "Metrics": "instrumentation:Metrics",
+    "PageAnalysis": "page_analysis:PageAnalysis",
+    "RenderCache": "render_cache:RenderCache",
+    "RenderPolicy": "render_policy:RenderPolicy",
+    "ResultCache": "result_cache:ResultCache",
+    "run_batch": "batch:run_batch",
+    "make_statement_pdf": "benchmark:make_statement_pdf",
+    "run_benchmark": "benchmark:run_benchmark",
+    "metrics": "instrumentation:metrics",
+    "profile": "instrumentation:profile",
+    "trace_memory": "instrumentation:trace_memory",
+}
+
+__all__ = sorted(_EXPORTS) + ["variant"]
+
+
+def variant(name):
+    """
+    Returns one specific reader script as a module, e.g. variant("reader12"),
+    for callers that depend on an earlier variant's exact behaviour.
+    """
+    if not re.fullmatch(r"reader\d*", name):
+        raise ValueError(f"Not a reader variant: {name!r}")
+    return importlib.import_module(name)
+
+
+def __getattr__(name):
+    target = _EXPORTS.get(name)
+    if target is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module_name, attribute = target.split(":")
+    value = getattr(importlib.import_module(module_name), attribute)
+    globals()[name] = value  # Later lookups skip __getattr__ entirely
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
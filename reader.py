@@ -1,29 +1,33 @@
-import fitz  # PyMuPDF
+from document_pool import open_document
 
 def extract_transactions_table(pdf_path, output_txt_path):
-    doc = fitz.open(pdf_path)
+    doc, owned = open_document(pdf_path)  # A path, bytes, memory map or stream
     extracted_tables = []
 
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        text = page.get_text()
-        lines = text.splitlines()
+    try:
+        for page_num in range(len(doc)):
+            page = doc.load_page(page_num)
+            text = page.get_text()
+            lines = text.splitlines()
 
-        # Look for exact match "TRANSACTIONS"
-        for i, line in enumerate(lines):
-            if line.strip() == "TRANSACTIONS":
-                # Extract lines that follow the keyword
-                table_lines = []
-                for follow_line in lines[i+1:]:
-                    if follow_line.strip() == "":
-                        continue
-                    # Stop if we hit another section or header
-                    if follow_line.isupper() and not follow_line.startswith("TRN_"):
-                        break
-                    table_lines.append(follow_line)
-                if table_lines:
-                    extracted_tables.append(f"\nPage {page_num + 1}:\n" + "\n".join(table_lines))
-                break  # Only one "TRANSACTIONS" section per page
+            # Look for exact match "TRANSACTIONS"
+            for i, line in enumerate(lines):
+                if line.strip() == "TRANSACTIONS":
+                    # Extract lines that follow the keyword
+                    table_lines = []
+                    for follow_line in lines[i+1:]:
+                        if follow_line.strip() == "":
+                            continue
+                        # Stop if we hit another section or header
+                        if follow_line.isupper() and not follow_line.startswith("TRN_"):
+                            break
+                        table_lines.append(follow_line)
+                    if table_lines:
+                        extracted_tables.append(f"\nPage {page_num + 1}:\n" + "\n".join(table_lines))
+                    break  # Only one "TRANSACTIONS" section per page
+    finally:
+        if owned:
+            doc.close()
 
     # Write to output file
     with open(output_txt_path, "w", encoding="utf-8") as f:
@@ -32,8 +36,9 @@ def extract_transactions_table(pdf_path, output_txt_path):
 
     print(f"✅ Extracted {len(extracted_tables)} table(s) to {output_txt_path}")
 
-# 🔧 Replace with your actual file paths
-pdf_path = "your_file.pdf"
-output_txt_path = "transactions_table.txt"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual file paths
+    pdf_path = "your_file.pdf"
+    output_txt_path = "transactions_table.txt"
 
-extract_transactions_table(pdf_path, output_txt_path)
+    extract_transactions_table(pdf_path, output_txt_path)
@@ -1,71 +1,81 @@
 import fitz  # PyMuPDF
-
-def extract_transaction_table_region(input_pdf_path, output_pdf_path):
-    doc = fitz.open(input_pdf_path)
-    output_doc = fitz.open()
-
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        blocks = page.get_text("blocks")
-
-        header_threshold = page.rect.height * 0.15
-        found_header = False
-        header_bottom = None
-
-        for block in blocks:
-            x0, y0, x1, y1, text, *_ = block
-            if text.strip() == "TRANSACTIONS" and y1 < header_threshold:
-                found_header = True
-                header_bottom = y1
-                break
-
-        if found_header:
-            # Scan blocks below header to find end of table
-            table_blocks = []
-            last_valid_y1 = None
-            for block in blocks:
-                x0, y0, x1, y1, text, *_ = block
-                if y0 <= header_bottom:
-                    continue  # Skip header and above
-                clean_text = text.strip()
-                if clean_text == "":
-                    continue
-
-                # Heuristic: stop if block looks like metadata
-                if (
-                    clean_text.isupper() and len(clean_text.split()) > 3
-                ) or (
-                    y1 - y0 < 8  # Very small height block (likely footnote)
-                ):
-                    break
-
-                table_blocks.append(block)
-                last_valid_y1 = y1
-
-            if not table_blocks or last_valid_y1 is None:
-                continue
-
-            # Define crop region from first to last valid block
-            table_top = table_blocks[0][1] - 5
-            table_bottom = last_valid_y1 + 5
-            table_rect = fitz.Rect(0, table_top, page.rect.width, table_bottom)
-
-            # Render cropped region
-            pix = page.get_pixmap(clip=table_rect, dpi=300)
-
-            # Output page layout
-            page_width = page.rect.width
-            image_height = table_rect.height
-            padding_top = 30
-            new_page_height = image_height + padding_top + 30
-
-            # Create new page and insert image
-            new_page = output_doc.new_page(width=page_width, height=new_page_height)
-            new_page.insert_text((50, 20), f"Page {page_num + 1} - TRANSACTIONS Table", fontsize=12)
-            new_page.insert_image(
-                fitz.Rect(0, padding_top, page_width, padding_top + image_height),
-                pixmap=pix
-            )
+from pdf_output import ChunkedPdfWriter
+from table_crop import build_table_pages
+
+def find_table_rect(analysis):
+    page = analysis.page
+
+    # Skip pages without the keyword in the header band before extracting everything
+    if not analysis.header_band_contains("TRANSACTIONS", 0.15):
+        return None
+
+    blocks = analysis.blocks
+
+    header_threshold = page.rect.height * 0.15
+    found_header = False
+    header_bottom = None
+
+    for block in blocks:
+        x0, y0, x1, y1, text, *_ = block
+        if text.strip() == "TRANSACTIONS" and y1 < header_threshold:
+            found_header = True
+            header_bottom = y1
+            break
+
+    if not found_header:
+        return None
+
+    # Scan blocks below header to find end of table
+    table_blocks = []
+    last_valid_y1 = None
+    for block in blocks:
+        x0, y0, x1, y1, text, *_ = block
+        if y0 <= header_bottom:
+            continue  # Skip header and above
+        clean_text = text.strip()
+        if clean_text == "":
+            continue
+
+        # Heuristic: stop if block looks like metadata
+        if (
+            clean_text.isupper() and len(clean_text.split()) > 3
+        ) or (
+            y1 - y0 < 8  # Very small height block (likely footnote)
+        ):
+            break
+
+        table_blocks.append(block)
+        last_valid_y1 = y1
+
+    if not table_blocks or last_valid_y1 is None:
+        return None
+
+    # Define crop region from first to last valid block
+    table_top = table_blocks[0][1] - 5
+    table_bottom = last_valid_y1 + 5
+    return fitz.Rect(0, table_top, page.rect.width, table_bottom)
+
+def layout_table_page(output_doc, page_num, page_rect, table_rect):
+    # Output page layout
+    page_width = page_rect.width
+    image_height = table_rect.height
+    padding_top = 30
+    new_page_height = image_height + padding_top + 30
+
+    # Create new page; the image goes below the title
+    new_page = output_doc.new_page(width=page_width, height=new_page_height)
+    new_page.insert_text((50, 20), f"Page {page_num + 1} - TRANSACTIONS Table", fontsize=12)
+    return new_page, fitz.Rect(0, padding_top, page_width, padding_top + image_height)
+
+def extract_transaction_table_region(input_pdf_path, output_pdf_path, workers=1, mode="raster", cache=None, render_policy=None, render_cache=None):
+    # Finished pages spill to disk in chunks, so memory stays flat on long statements
+    output_doc = ChunkedPdfWriter()
+
+    # Render cropped regions as images, or place them as vector content with mode="vector"
+    # (sharded over `workers` processes when > 1, with detection results cached in `cache`);
+    # a RenderPolicy picks the resolution, colourspace and compression of rendered regions,
+    # and a RenderCache keeps them, so a rerun with another layout renders nothing
+    build_table_pages(input_pdf_path, output_doc, find_table_rect, layout_table_page, workers=workers, mode=mode, cache=cache, render_policy=render_policy, render_cache=render_cache)
 
     if output_doc.page_count > 0:
         output_doc.save(output_pdf_path)
@@ -73,11 +83,11 @@ def extract_transaction_table_region(input_pdf_path, output_pdf_path):
     else:
         print("⚠️ No matching pages found.")
 
-    doc.close()
     output_doc.close()
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_pdf = r"C:\Users\Suren\Downloads\transactions_table_only.pdf"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\transactions_table_only.pdf"
 
-extract_transaction_table_region(input_pdf, output_pdf)
+    extract_transaction_table_region(input_pdf, output_pdf)
@@ -1,4 +1,6 @@
 import fitz  # PyMuPDF
+from pdf_output import ChunkedPdfWriter
+from table_crop import build_table_pages
 
 def is_table_row(text):
     # Heuristic: must contain at least 3 fields and known data types
@@ -7,48 +9,49 @@ def is_table_row(text):
         len(text.strip().split()) >= 3
     )
 
-def extract_table_only(input_pdf_path, output_pdf_path):
-    doc = fitz.open(input_pdf_path)
-    output_doc = fitz.open()
+def find_table_rect(analysis):
+    page = analysis.page
+    blocks = analysis.block_index.by_top  # sorted by y0 once per page
 
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        blocks = sorted(page.get_text("blocks"), key=lambda b: b[1])  # sort by y0
+    table_blocks = []
+    collecting = False
 
-        table_blocks = []
-        collecting = False
+    for block in blocks:
+        x0, y0, x1, y1, text, *_ = block
+        clean_text = text.strip()
 
-        for block in blocks:
-            x0, y0, x1, y1, text, *_ = block
-            clean_text = text.strip()
-
-            if not collecting:
-                if is_table_row(clean_text):
-                    collecting = True
-                    table_blocks.append(block)
+        if not collecting:
+            if is_table_row(clean_text):
+                collecting = True
+                table_blocks.append(block)
+        else:
+            if is_table_row(clean_text):
+                table_blocks.append(block)
             else:
-                if is_table_row(clean_text):
-                    table_blocks.append(block)
-                else:
-                    break  # Stop when pattern breaks
+                break  # Stop when pattern breaks
+
+    if not table_blocks:
+        return None
 
-        if not table_blocks:
-            continue
+    # Define crop region
+    table_top = table_blocks[0][1] - 5
+    table_bottom = table_blocks[-1][3] + 5
+    return fitz.Rect(0, table_top, page.rect.width, table_bottom)
 
-        # Define crop region
-        table_top = table_blocks[0][1] - 5
-        table_bottom = table_blocks[-1][3] + 5
-        table_rect = fitz.Rect(0, table_top, page.rect.width, table_bottom)
+def layout_table_page(output_doc, page_num, page_rect, table_rect):
+    # Create new page; the region goes below a 30pt top margin
+    new_page = output_doc.new_page(width=page_rect.width, height=table_rect.height + 30)
+    return new_page, fitz.Rect(0, 30, page_rect.width, 30 + table_rect.height)
 
-        # Render cropped region
-        pix = page.get_pixmap(clip=table_rect, dpi=300)
+def extract_table_only(input_pdf_path, output_pdf_path, workers=1, mode="raster", cache=None, render_policy=None, render_cache=None):
+    # Finished pages spill to disk in chunks, so memory stays flat on long statements
+    output_doc = ChunkedPdfWriter()
 
-        # Create new page and insert image
-        new_page = output_doc.new_page(width=page.rect.width, height=table_rect.height + 30)
-        new_page.insert_image(
-            fitz.Rect(0, 30, page.rect.width, 30 + table_rect.height),
-            pixmap=pix
-        )
+    # Render cropped regions as images, or place them as vector content with mode="vector"
+    # (sharded over `workers` processes when > 1, with detection results cached in `cache`);
+    # a RenderPolicy picks the resolution, colourspace and compression of rendered regions,
+    # and a RenderCache keeps them, so a rerun with another layout renders nothing
+    build_table_pages(input_pdf_path, output_doc, find_table_rect, layout_table_page, workers=workers, mode=mode, cache=cache, render_policy=render_policy, render_cache=render_cache)
 
     if output_doc.page_count > 0:
         output_doc.save(output_pdf_path)
@@ -56,11 +59,11 @@ def extract_table_only(input_pdf_path, output_pdf_path):
     else:
         print("⚠️ No table rows found.")
 
-    doc.close()
     output_doc.close()
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_pdf = r"C:\Users\Suren\Downloads\clean_table_only.pdf"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\clean_table_only.pdf"
 
-extract_table_only(input_pdf, output_pdf)
+    extract_table_only(input_pdf, output_pdf)
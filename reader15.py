@@ -1,4 +1,7 @@
 import fitz  # PyMuPDF
+from functools import partial
+from pdf_output import ChunkedPdfWriter
+from table_crop import build_table_pages
 
 def is_table_row(text):
     return (
@@ -6,65 +9,68 @@ def is_table_row(text):
         len(text.strip().split()) >= 3
     )
 
-def extract_table_if_header_present(input_pdf_path, output_pdf_path, header_keywords):
-    doc = fitz.open(input_pdf_path)
-    output_doc = fitz.open()
-
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        blocks = sorted(page.get_text("blocks"), key=lambda b: b[1])  # sort by y0
-
-        # Step 1: Check for header in top 20% of page
-        header_zone = page.rect.height * 0.2
-        header_found = False
-        header_bottom = None
-
-        for block in blocks:
-            x0, y0, x1, y1, text, *_ = block
-            if y1 <= header_zone:
-                if any(header in text.upper() for header in header_keywords):
-                    header_found = True
-                    header_bottom = y1
-                    break
-
-        if not header_found:
-            continue  # Skip page
-
-        # Step 2: Collect table rows below header
-        table_blocks = []
-        collecting = False
-
-        for block in blocks:
-            x0, y0, x1, y1, text, *_ = block
-            if y0 <= header_bottom:
-                continue  # Skip blocks above header
-
-            clean_text = text.strip()
-            if not collecting:
-                if is_table_row(clean_text):
-                    collecting = True
-                    table_blocks.append(block)
+def find_table_rect(analysis, header_keywords):
+    page = analysis.page
+
+    # Skip pages without the keyword in the header band before extracting everything
+    if not analysis.header_band_contains(header_keywords, 0.2):
+        return None
+
+    # Step 1: Check for header in top 20% of page
+    header_zone = page.rect.height * 0.2
+    header_found = False
+    header_bottom = None
+
+    # Blocks inside the header zone, top to bottom
+    for block in analysis.block_index.above(header_zone):
+        x0, y0, x1, y1, text, *_ = block
+        if any(header in text.upper() for header in header_keywords):
+            header_found = True
+            header_bottom = y1
+            break
+
+    if not header_found:
+        return None  # Skip page
+
+    # Step 2: Collect table rows below header
+    table_blocks = []
+    collecting = False
+
+    for block in analysis.block_index.below(header_bottom):
+        x0, y0, x1, y1, text, *_ = block
+        clean_text = text.strip()
+        if not collecting:
+            if is_table_row(clean_text):
+                collecting = True
+                table_blocks.append(block)
+        else:
+            if is_table_row(clean_text):
+                table_blocks.append(block)
             else:
-                if is_table_row(clean_text):
-                    table_blocks.append(block)
-                else:
-                    break  # Stop when pattern breaks
+                break  # Stop when pattern breaks
 
-        if not table_blocks:
-            continue
+    if not table_blocks:
+        return None
 
-        # Step 3: Crop and render table region
-        table_top = table_blocks[0][1] - 5
-        table_bottom = table_blocks[-1][3] + 5
-        table_rect = fitz.Rect(0, table_top, page.rect.width, table_bottom)
+    # Step 3: Crop region
+    table_top = table_blocks[0][1] - 5
+    table_bottom = table_blocks[-1][3] + 5
+    return fitz.Rect(0, table_top, page.rect.width, table_bottom)
 
-        pix = page.get_pixmap(clip=table_rect, dpi=300)
+def layout_table_page(output_doc, page_num, page_rect, table_rect):
+    new_page = output_doc.new_page(width=page_rect.width, height=table_rect.height + 30)
+    return new_page, fitz.Rect(0, 30, page_rect.width, 30 + table_rect.height)
 
-        new_page = output_doc.new_page(width=page.rect.width, height=table_rect.height + 30)
-        new_page.insert_image(
-            fitz.Rect(0, 30, page.rect.width, 30 + table_rect.height),
-            pixmap=pix
-        )
+def extract_table_if_header_present(input_pdf_path, output_pdf_path, header_keywords, workers=1, mode="raster", cache=None, render_policy=None, render_cache=None):
+    # Finished pages spill to disk in chunks, so memory stays flat on long statements
+    output_doc = ChunkedPdfWriter()
+
+    # Render cropped regions as images, or place them as vector content with mode="vector"
+    # (sharded over `workers` processes when > 1, with detection results cached in `cache`);
+    # a RenderPolicy picks the resolution, colourspace and compression of rendered regions,
+    # and a RenderCache keeps them, so a rerun with another layout renders nothing
+    find_rect = partial(find_table_rect, header_keywords=header_keywords)
+    build_table_pages(input_pdf_path, output_doc, find_rect, layout_table_page, workers=workers, mode=mode, cache=cache, render_policy=render_policy, render_cache=render_cache)
 
     if output_doc.page_count > 0:
         output_doc.save(output_pdf_path)
@@ -72,12 +78,12 @@ def extract_table_if_header_present(input_pdf_path, output_pdf_path, header_keyw
     else:
         print("⚠️ No matching headers found.")
 
-    doc.close()
     output_doc.close()
 
-# 🔧 Replace with your actual paths and header keywords
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_pdf = r"C:\Users\Suren\Downloads\transaction_tables_only.pdf"
-header_keywords = ["TRANSACTION", "TRAN_SUMS"]
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths and header keywords
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\transaction_tables_only.pdf"
+    header_keywords = ["TRANSACTION", "TRAN_SUMS"]
 
-extract_table_if_header_present(input_pdf, output_pdf, header_keywords)
+    extract_table_if_header_present(input_pdf, output_pdf, header_keywords)
@@ -1,57 +1,79 @@
 import fitz  # PyMuPDF
+from checkpoint import update_table_pdf
+from pdf_output import ChunkedPdfWriter
+from table_crop import build_table_pages
 
-def extract_transaction_table_region(input_pdf_path, output_pdf_path):
-    doc = fitz.open(input_pdf_path)
-    output_doc = fitz.open()
-
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        blocks = page.get_text("blocks")
-
-        header_threshold = page.rect.height * 0.15
-        found_header = False
-        header_bottom = None
-
-        for block in blocks:
-            x0, y0, x1, y1, text, *_ = block
-            if text.strip() == "TRANSACTIONS" and y1 < header_threshold:
-                found_header = True
-                header_bottom = y1
-                break
-
-        if found_header:
-            table_blocks = []
-            for block in blocks:
-                x0, y0, x1, y1, text, *_ = block
-                if y0 <= header_bottom:
-                    continue
-                clean_text = text.strip()
-                if clean_text == "":
-                    continue
-                if clean_text.isupper() and (
-                    "PRIMARY KEY" in clean_text or
-                    "FOREIGN KEY" in clean_text or
-                    "REFERENCES" in clean_text or
-                    "CONSTRAINT" in clean_text
-                ):
-                    break
-                table_blocks.append(block)
-
-            if not table_blocks:
-                continue
-
-            table_top = table_blocks[0][1] - 5
-            table_bottom = table_blocks[-1][3] + 5
-            table_rect = fitz.Rect(0, table_top, page.rect.width, table_bottom)
-
-            pix = page.get_pixmap(clip=table_rect, dpi=300)
-
-            # Create new page with exact height of table image
-            new_page = output_doc.new_page(width=page.rect.width, height=table_rect.height)
-            new_page.insert_image(
-                fitz.Rect(0, 0, page.rect.width, table_rect.height),
-                pixmap=pix
-            )
+def find_table_rect(analysis):
+    page = analysis.page
+
+    # Skip pages without the keyword in the header band before extracting everything
+    if not analysis.header_band_contains("TRANSACTIONS", 0.15):
+        return None
+
+    blocks = analysis.blocks
+
+    header_threshold = page.rect.height * 0.15
+    found_header = False
+    header_bottom = None
+
+    for block in blocks:
+        x0, y0, x1, y1, text, *_ = block
+        if text.strip() == "TRANSACTIONS" and y1 < header_threshold:
+            found_header = True
+            header_bottom = y1
+            break
+
+    if not found_header:
+        return None
+
+    table_blocks = []
+    for block in blocks:
+        x0, y0, x1, y1, text, *_ = block
+        if y0 <= header_bottom:
+            continue
+        clean_text = text.strip()
+        if clean_text == "":
+            continue
+        if clean_text.isupper() and (
+            "PRIMARY KEY" in clean_text or
+            "FOREIGN KEY" in clean_text or
+            "REFERENCES" in clean_text or
+            "CONSTRAINT" in clean_text
+        ):
+            break
+        table_blocks.append(block)
+
+    if not table_blocks:
+        return None
+
+    table_top = table_blocks[0][1] - 5
+    table_bottom = table_blocks[-1][3] + 5
+    return fitz.Rect(0, table_top, page.rect.width, table_bottom)
+
+def layout_table_page(output_doc, page_num, page_rect, table_rect):
+    # Create new page with exact height of table image
+    new_page = output_doc.new_page(width=page_rect.width, height=table_rect.height)
+    return new_page, fitz.Rect(0, 0, page_rect.width, table_rect.height)
+
+def extract_transaction_table_region(input_pdf_path, output_pdf_path, workers=1, mode="raster", cache=None, incremental=False, render_policy=None, render_cache=None):
+    if incremental:
+        # Only pages added or changed since the last run are cropped; the output PDF
+        # is updated in place, with a checkpoint file next to it
+        processed, page_count = update_table_pdf(
+            input_pdf_path, output_pdf_path, find_table_rect, layout_table_page, workers=workers, mode=mode, cache=cache,
+            render_policy=render_policy, render_cache=render_cache,
+        )
+        print(f"✅ {processed} new or changed page(s) processed, {page_count} table page(s) in: {output_pdf_path}")
+        return
+
+    # Finished pages spill to disk in chunks, so memory stays flat on long statements
+    output_doc = ChunkedPdfWriter()
+
+    # Render cropped regions as images, or place them as vector content with mode="vector"
+    # (sharded over `workers` processes when > 1, with detection results cached in `cache`);
+    # a RenderPolicy picks the resolution, colourspace and compression of rendered regions,
+    # and a RenderCache keeps them, so a rerun with another layout renders nothing
+    build_table_pages(input_pdf_path, output_doc, find_table_rect, layout_table_page, workers=workers, mode=mode, cache=cache, render_policy=render_policy, render_cache=render_cache)
 
     if output_doc.page_count > 0:
         output_doc.save(output_pdf_path)
@@ -59,11 +81,11 @@ def extract_transaction_table_region(input_pdf_path, output_pdf_path):
     else:
         print("⚠️ No matching pages found.")
 
-    doc.close()
     output_doc.close()
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_pdf = r"C:\Users\Suren\Downloads\transactions_table_only_clean.pdf"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\transactions_table_only_clean.pdf"
 
-extract_transaction_table_region(input_pdf, output_pdf)
+    extract_transaction_table_region(input_pdf, output_pdf)
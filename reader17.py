@@ -1,65 +1,63 @@
 import fitz  # PyMuPDF
 from PyPDF2 import PdfWriter, PdfReader
+from PyPDF2.generic import RectangleObject
+from document_pool import open_document, pdf_file, pdf_input
+from page_analysis import PageAnalysis
+from page_model import BlockColumns
 
 def extract_table_regions(input_pdf, output_pdf):
-    doc = fitz.open(input_pdf)
+    # Paths are used as is; bytes, memory maps and streams are resolved once into a
+    # buffer that both libraries read in place
     writer = PdfWriter()
+    with pdf_input(input_pdf) as input_pdf, pdf_file(input_pdf) as f:
+        doc, owned = open_document(input_pdf)
+        reader = PdfReader(f)  # Parsed once; pages are loaded lazily on access
+
+        for page_num in range(len(doc)):
+            page = doc.load_page(page_num)
+            # Blocks as coordinate columns plus one text buffer, read from the text page's block list
+            blocks = BlockColumns.from_textpage(PageAnalysis(page).textpage)
+            page_height = float(page.mediabox.height)
+            footer_threshold = page_height * 0.90  # bottom 10%
+
+            # Each keyword is searched once across the page's whole text buffer
+            metadata_blocks = blocks.containing_any([
+                "primary key", "foreign key", "references", "constraint",
+                "currencies", "data_sources", "job_id"
+            ])
+            header_blocks = blocks.containing("column name") & blocks.containing("data type")
 
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        blocks = page.get_text("dict")["blocks"]
-        page_height = float(page.mediabox.height)
-
-        # Sort blocks top to bottom
-        sorted_blocks = sorted(
-            [b for b in blocks if "lines" in b],
-            key=lambda b: b["bbox"][1]
-        )
-
-        table_started = False
-        table_blocks = []
-        footer_threshold = page_height * 0.90  # bottom 10%
-
-        for block in sorted_blocks:
-            y0, y1 = block["bbox"][1], block["bbox"][3]
-            text = " ".join([span["text"] for line in block["lines"] for span in line["spans"]]).strip()
-            lower_text = text.lower()
+            table_blocks = []
+            # Blocks top to bottom, footer blocks left out
+            for index in blocks.top_to_bottom(max_y1=footer_threshold):
+                # Stop at metadata blocks on last page
+                if index in metadata_blocks:
+                    break
 
-            # Skip footer blocks
-            if y1 > footer_threshold:
-                continue
+                # Start collecting only after table header
+                if table_blocks or index in header_blocks:
+                    table_blocks.append(index)
 
-            # Skip metadata blocks on last page
-            if any(kw in lower_text for kw in [
-                "primary key", "foreign key", "references", "constraint",
-                "currencies", "data_sources", "job_id"
-            ]):
-                break
+            # Determine crop box from table blocks
+            if table_blocks:
+                x0, y0, x1, y1 = blocks.bounds(table_blocks)
+                y1 = min(y1, footer_threshold - 10)
 
-            # Start collecting only after table header
-            if not table_started:
-                if "column name" in lower_text and "data type" in lower_text:
-                    table_started = True
-                else:
-                    continue
+                # Convert the crop from MuPDF (top-left origin) to PDF coordinates
+                crop = fitz.Rect(x0, y0, x1, y1) * ~page.transformation_matrix
 
-            if table_started:
-                table_blocks.append(block)
+                # Add the page by reference and crop the output page object itself
+                output_page = writer.add_page(reader.pages[page_num])
+                output_page.cropbox = RectangleObject([crop.x0, crop.y0, crop.x1, crop.y1])
 
-        # Determine crop box from table blocks
-        if table_blocks:
-            x0 = min(b["bbox"][0] for b in table_blocks)
-            y0 = min(b["bbox"][1] for b in table_blocks)
-            x1 = max(b["bbox"][2] for b in table_blocks)
-            y1 = min(max(b["bbox"][3] for b in table_blocks), footer_threshold - 10)
+        if owned:
+            doc.close()
 
-            # Crop and add to output
-            page.set_cropbox(fitz.Rect(x0, y0, x1, y1))
-            writer.add_page(PdfReader(input_pdf).pages[page_num])
+        # Save output while the input is still open: the writer copies the pages from it
+        with open(output_pdf, "wb") as out:
+            writer.write(out)
 
-    # Save output
-    with open(output_pdf, "wb") as f:
-        writer.write(f)
 
-# Example usage
-extract_table_regions("input.pdf", "output_cleaned.pdf")
+if __name__ == "__main__":
+    # Example usage
+    extract_table_regions("input.pdf", "output_cleaned.pdf")
@@ -1,12 +1,20 @@
 import fitz  # PyMuPDF
+from document_pool import open_document
+from page_analysis import PageAnalysis
 
 def extract_transaction_tables_to_pdf(input_pdf_path, output_pdf_path, keyword="TRANSACTIONS"):
-    doc = fitz.open(input_pdf_path)
+    doc, owned = open_document(input_pdf_path)  # A path, bytes, memory map or stream
     output_doc = fitz.open()
 
     for page_num in range(len(doc)):
         page = doc.load_page(page_num)
-        text_blocks = page.get_text("blocks")  # Get text with position info
+        analysis = PageAnalysis(page)  # Text is extracted once and reused below
+
+        # Skip pages without the keyword in the header band before extracting everything
+        if not analysis.header_band_contains(keyword, 0.3):
+            continue
+
+        text_blocks = analysis.blocks  # Get text with position info
 
         # Check top-right corner for keyword
         found_macro = False
@@ -19,7 +27,7 @@ def extract_transaction_tables_to_pdf(input_pdf_path, output_pdf_path, keyword="
         if found_macro:
             # Extract table-like text from the page
             table_text = ""
-            lines = page.get_text().splitlines()
+            lines = analysis.text().splitlines()
             for line in lines:
                 if line.strip() == "":
                     continue
@@ -38,11 +46,13 @@ def extract_transaction_tables_to_pdf(input_pdf_path, output_pdf_path, keyword="
     else:
         print("⚠️ No pages with the specified macro were found.")
 
-    doc.close()
+    if owned:
+        doc.close()
     output_doc.close()
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_pdf = r"C:\Users\Suren\Downloads\transactions_output.pdf"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\transactions_output.pdf"
 
-extract_transaction_tables_to_pdf(input_pdf, output_pdf)
+    extract_transaction_tables_to_pdf(input_pdf, output_pdf)
@@ -1,8 +1,103 @@
 import fitz  # PyMuPDF
 import json
 import re
+from checkpoint import update_jsonl_output
+from column_segmentation import segment_table
+from page_analysis import PageAnalysis
+from result_cache import iter_page_results
+from table_output import open_table_writer
 
-def extract_transaction_table_to_json(input_pdf_path, output_json_path):
+def parse_page_table(page_num, page):
+    """
+    Parses the table below a 'TRANSACTIONS' header on one page.
+
+    Args:
+        page_num (int): The zero-based page number.
+        page (fitz.Page): The page to parse.
+
+    Returns:
+        dict | None: The table as {header: [values...]}, or None if the page has no table.
+    """
+    print(f"🔎 Analyzing page {page_num + 1}...")
+    # Extract the page text once; header search and table parsing both reuse it
+    analysis = PageAnalysis(page)
+    blocks = analysis.blocks
+    header_bottom = None
+
+    # Use a more flexible regex search for the header, ignoring case
+    header_pattern = re.compile(r"transactions", re.IGNORECASE)
+
+    # Find the header to define the start of the table region
+    for block in blocks:
+        x0, y0, x1, y1, text, *_ = block
+        if header_pattern.search(text.strip()):
+            print(f"✅ Found header 'TRANSACTIONS' on page {page_num + 1}.")
+            header_bottom = y1
+            break
+
+    if header_bottom is None:
+        return None
+
+    table_blocks = []
+    # Find the blocks that belong to the table
+    for block in blocks:
+        x0, y0, x1, y1, text, *_ = block
+        clean_text = text.strip()
+
+        # This is a heuristic to find the end of the table
+        # Based on the assumption that the table ends before a section of all-caps text,
+        # like a new header or a SQL-like constraint. You may need to adjust this.
+        if y0 > header_bottom and clean_text.isupper() and (
+            "PRIMARY KEY" in clean_text or
+            "FOREIGN KEY" in clean_text or
+            "REFERENCES" in clean_text or
+            "CONSTRAINT" in clean_text
+        ):
+            print(f"🛑 Found end of table marker: '{clean_text[:20]}...'")
+            break
+
+        if y0 > header_bottom and clean_text:
+            table_blocks.append(block)
+
+    # If no table region was found
+    if not table_blocks:
+        return None
+
+    # Get the bounding box for the entire table region
+    table_top = table_blocks[0][1] - 5
+    table_bottom = table_blocks[-1][3] + 5
+    table_rect = fitz.Rect(0, table_top, page.rect.width, table_bottom)
+
+    # Words whose middle lies inside the table region; one pass, as the page is queried only once
+    words = [
+        word for word in analysis.words
+        if table_rect.contains(fitz.Point((word[0] + word[2]) / 2, (word[1] + word[3]) / 2))
+    ]
+
+    # Split the region into cells by the words' x positions; the first row is the header row
+    table = segment_table(words)
+    if table is None:
+        print(f"⚠️ No text found in the defined table region on page {page_num + 1}.")
+        return None
+    headers, rows = table
+
+    # Check for a single header that is a full sentence and ignore it
+    if len(headers) < 2:
+        print(f"⚠️ Could not parse headers on page {page_num + 1}. Header line was: '{' '.join(headers)}'")
+        return None
+
+    # Initialize a dictionary for the current table's data
+    current_table_data = {header: [] for header in headers}
+
+    # Every row has one cell per header; missing values stay as empty strings
+    for row in rows:
+        for header, value in zip(headers, row):
+            current_table_data[header].append(value)
+
+    return current_table_data
+
+def extract_transaction_table_to_json(input_pdf_path, output_json_path, cache=None, output_format="json", incremental=False,
+                                      batch_rows=None):
     """
     Extracts a table from a PDF based on a 'TRANSACTIONS' header and
     saves the data to a JSON file.
@@ -10,94 +105,50 @@ def extract_transaction_table_to_json(input_pdf_path, output_json_path):
     Args:
         input_pdf_path (str): The path to the input PDF file.
         output_json_path (str): The path to the output JSON file.
+        cache (ResultCache, optional): Persistent cache of parsed pages. Repeat
+            runs on the same file skip parsing entirely, and a partly changed
+            file only re-parses the pages that changed.
+        output_format (str): "json" writes everything at the end (a single table
+            as a dict, several as a list). "jsonl" streams one table record per
+            line as each page finishes, "jsonl-rows" one row record per line.
+            "parquet" and "arrow" write typed columnar files (needs pyarrow).
+        incremental (bool): Only parse pages added or changed since the last run
+            and update the output in place, tracked by a checkpoint file next to
+            it. Needs output_format "jsonl" or "jsonl-rows".
+        batch_rows (int, optional): Rows per row group for "parquet" and "arrow"
+            (see columnar_output.ColumnarTableWriter).
     """
-    doc = fitz.open(input_pdf_path)
-    all_table_data = []
+    if incremental:
+        if output_format not in ("jsonl", "jsonl-rows"):
+            raise ValueError(f"Incremental runs need a JSON Lines output format, not {output_format!r}")
+        records = "row" if output_format == "jsonl-rows" else "table"
+        processed, tables = update_jsonl_output(input_pdf_path, output_json_path, parse_page_table, records=records, cache=cache)
+        print(f"✅ {processed} new or changed page(s) processed, {tables} table(s) in: {output_json_path}")
+        return
 
-    # Iterate through each page of the document
-    for page_num, page in enumerate(doc):
-        print(f"🔎 Analyzing page {page_num + 1}...")
-        blocks = page.get_text("blocks")
-        header_bottom = None
-
-        # Use a more flexible regex search for the header, ignoring case
-        header_pattern = re.compile(r"transactions", re.IGNORECASE)
-
-        # Find the header to define the start of the table region
-        for block in blocks:
-            x0, y0, x1, y1, text, *_ = block
-            if header_pattern.search(text.strip()):
-                print(f"✅ Found header 'TRANSACTIONS' on page {page_num + 1}.")
-                header_bottom = y1
-                break
-
-        if header_bottom is not None:
-            table_blocks = []
-            # Find the blocks that belong to the table
-            for block in blocks:
-                x0, y0, x1, y1, text, *_ = block
-                clean_text = text.strip()
-
-                # This is a heuristic to find the end of the table
-                # Based on the assumption that the table ends before a section of all-caps text,
-                # like a new header or a SQL-like constraint. You may need to adjust this.
-                if y0 > header_bottom and clean_text.isupper() and (
-                    "PRIMARY KEY" in clean_text or
-                    "FOREIGN KEY" in clean_text or
-                    "REFERENCES" in clean_text or
-                    "CONSTRAINT" in clean_text
-                ):
-                    print(f"🛑 Found end of table marker: '{clean_text[:20]}...'")
-                    break
-
-                if y0 > header_bottom and clean_text:
-                    table_blocks.append(block)
-
-            # If a table region was found
-            if table_blocks:
-                # Get the bounding box for the entire table region
-                table_top = table_blocks[0][1] - 5
-                table_bottom = table_blocks[-1][3] + 5
-                table_rect = fitz.Rect(0, table_top, page.rect.width, table_bottom)
-
-                # Extract raw text from the defined table region
-                raw_text = page.get_text("text", clip=table_rect)
-                lines = raw_text.strip().split('\n')
-
-                if not lines:
-                    print(f"⚠️ No text found in the defined table region on page {page_num + 1}.")
-                    continue
-
-                # The first non-empty line is assumed to be the header row
-                header_line = lines[0].strip()
-                # Split headers by multiple spaces, which is common in tabular data
-                headers = re.split(r'\s{2,}', header_line)
-
-                # Check for a single header that is a full sentence and ignore it
-                if len(headers) < 2:
-                    print(f"⚠️ Could not parse headers on page {page_num + 1}. Header line was: '{header_line}'")
-                    continue
-                
-                # The rest are data rows
-                data_lines = lines[1:]
-                
-                # Initialize a dictionary for the current table's data
-                current_table_data = {header: [] for header in headers}
-
-                for line in data_lines:
-                    # Clean up the line and split it based on header alignment
-                    # This simple split will work if the data is well-aligned
-                    values = re.split(r'\s{2,}', line.strip())
-
-                    # Ensure the number of values matches the number of headers
-                    if len(values) == len(headers):
-                        for i, value in enumerate(values):
-                            current_table_data[headers[i]].append(value)
-                
+    all_table_data = []
+    table_writer = open_table_writer(output_json_path, output_format, batch_rows)
+
+    try:
+        # Iterate through each page of the document
+        for page_num, current_table_data in iter_page_results(input_pdf_path, parse_page_table, cache=cache):
+            if table_writer is not None:
+                # Stream the table straight out instead of holding it in memory
+                table_writer.write_table(page_num, 0, current_table_data)
+            else:
                 # Add the parsed table data to our list of all tables found
                 all_table_data.append(current_table_data)
-
-    doc.close()
+    finally:
+        # Closed on errors too, so the tables streamed so far are flushed and the file is complete
+        if table_writer is not None:
+            table_writer.close()
+
+    if table_writer is not None:
+        if table_writer.tables_written:
+            print(f"✅ {table_writer.tables_written} table(s) streamed to: {output_json_path}")
+        else:
+            print("⚠️ No matching tables found in the PDF.")
+        return
 
     # Check if any data was extracted
     if all_table_data:
@@ -115,8 +166,9 @@ def extract_transaction_table_to_json(input_pdf_path, output_json_path):
     else:
         print("⚠️ No matching tables found in the PDF.")
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_json = r"C:\Users\Suren\Downloads\transactions_table_data.json"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_json = r"C:\Users\Suren\Downloads\transactions_table_data.json"
 
-extract_transaction_table_to_json(input_pdf, output_json)
+    extract_transaction_table_to_json(input_pdf, output_json)
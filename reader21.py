@@ -1,9 +1,13 @@
 import pdfplumber
 import json
 import re
-from typing import List, Dict, Any
+from typing import BinaryIO, Optional, Union
+from document_pool import pdf_file
+from instrumentation import metrics
+from table_output import open_table_writer
 
-def extract_transaction_table_with_plumber(input_pdf_path: str, output_json_path: str):
+def extract_transaction_table_with_plumber(input_pdf_path: Union[str, bytes, memoryview, BinaryIO], output_json_path: str, output_format: str = "json",
+                                          batch_rows: Optional[int] = None):
     """
     Extracts a table from a PDF based on a 'TRANSACTIONS' header using pdfplumber
     and saves the data to a JSON file.
@@ -12,67 +16,72 @@ def extract_transaction_table_with_plumber(input_pdf_path: str, output_json_path
     which are more robust than manual text block parsing.
 
     Args:
-        input_pdf_path (str): The path to the input PDF file.
+        input_pdf_path (str | bytes | memoryview | BinaryIO): The input PDF, as a path,
+            bytes-like object, memory map or binary stream (read without a temporary file).
         output_json_path (str): The path to the output JSON file.
+        output_format (str): "json" writes everything at the end (a single table
+            as a dict, several as a list). "jsonl" streams one table record per
+            line as each page finishes, "jsonl-rows" one row record per line.
+            "parquet" and "arrow" write typed columnar files (needs pyarrow).
+        batch_rows (int, optional): Rows per row group for "parquet" and "arrow"
+            (see columnar_output.ColumnarTableWriter).
     """
     all_table_data = []
+    table_writer = open_table_writer(output_json_path, output_format, batch_rows)
     
     # Use a flexible regex to find the header, ignoring case and whitespace
     header_pattern = re.compile(r"transactions", re.IGNORECASE)
 
     try:
-        with pdfplumber.open(input_pdf_path) as pdf:
+        with pdf_file(input_pdf_path) as f, pdfplumber.open(f) as pdf:
             # Iterate through each page of the document
             for page_num, page in enumerate(pdf.pages):
                 print(f"🔎 Analyzing page {page_num + 1}...")
+                metrics.count("pages_scanned")
                 
-                # Check for the presence of the header on the page
-                raw_text = page.extract_text()
-                if not raw_text:
+                # Extract the words once; the header's position comes straight from them
+                with metrics.stage("header_search"):
+                    header_words = [word for word in page.extract_words() if header_pattern.search(word["text"])]
+                if not header_words:
                     continue
 
-                if header_pattern.search(raw_text):
-                    print(f"✅ Found header 'TRANSACTIONS' on page {page_num + 1}.")
-                    
-                    # Find the bounding box of the header to define the crop area
-                    header_bbox = None
-                    for block in page.extract_text(x_tolerance=1, y_tolerance=1, layout=True).split("\n\n"):
-                        # Extract the block text and its bbox. We use this method
-                        # to get more accurate block coordinates.
-                        lines = block.split('\n')
-                        for line in lines:
-                            if header_pattern.search(line):
-                                header_bbox = page.crop(page.find_tables()[0].bbox).bbox
-                                break
-                        if header_bbox:
-                            break
-                    
-                    # Use a heuristic to define the table region. pdfplumber is good at
-                    # finding tables, so we can just look for the first one.
-                    # This assumes the 'TRANSACTIONS' header is directly above the table.
-                    tables = page.find_tables()
+                print(f"✅ Found header 'TRANSACTIONS' on page {page_num + 1}.")
+                header_bottom = min(header_words, key=lambda word: word["top"])["bottom"]
+                if header_bottom >= page.height:
+                    continue
+
+                # Look for tables only below the header: a single find_tables call
+                # on the cropped region instead of scanning the whole page
+                table_region = page.crop((0, header_bottom, page.width, page.height))
+                with metrics.stage("find_tables"):
+                    tables = table_region.find_tables()
 
-                    if tables:
-                        for table in tables:
-                            # Extract the raw table data as a list of lists
-                            extracted_data = table.extract()
-                            
-                            if extracted_data and len(extracted_data) > 1:
-                                # The first row is the header
-                                headers = [h.strip() if h else '' for h in extracted_data[0]]
-                                # The rest are the data rows
-                                data_rows = extracted_data[1:]
+                if tables:
+                    metrics.count("pages_matched")
+                    for table_index, table in enumerate(tables):
+                        # Extract the raw table data as a list of lists
+                        extracted_data = table.extract()
+                        
+                        if extracted_data and len(extracted_data) > 1:
+                            # The first row is the header
+                            headers = [h.strip() if h else '' for h in extracted_data[0]]
+                            # The rest are the data rows
+                            data_rows = extracted_data[1:]
 
-                                # Sanity check: Ensure we have headers and at least one data row
-                                if any(headers) and data_rows:
-                                    current_table_data = {header: [] for header in headers}
-                                    
-                                    for row in data_rows:
-                                        if len(row) == len(headers):
-                                            for i, value in enumerate(row):
-                                                # Append value, stripping whitespace
-                                                current_table_data[headers[i]].append(value.strip() if value else '')
-                                    
+                            # Sanity check: Ensure we have headers and at least one data row
+                            if any(headers) and data_rows:
+                                current_table_data = {header: [] for header in headers}
+                                
+                                for row in data_rows:
+                                    if len(row) == len(headers):
+                                        for i, value in enumerate(row):
+                                            # Append value, stripping whitespace
+                                            current_table_data[headers[i]].append(value.strip() if value else '')
+                                
+                                if table_writer is not None:
+                                    # Stream the table straight out instead of holding it in memory
+                                    table_writer.write_table(page_num, table_index, current_table_data)
+                                else:
                                     all_table_data.append(current_table_data)
 
     except FileNotFoundError:
@@ -81,6 +90,16 @@ def extract_transaction_table_with_plumber(input_pdf_path: str, output_json_path
     except Exception as e:
         print(f"❌ An error occurred during PDF processing: {e}")
         return
+    finally:
+        if table_writer is not None:
+            table_writer.close()
+
+    if table_writer is not None:
+        if table_writer.tables_written:
+            print(f"✅ {table_writer.tables_written} table(s) streamed to: {output_json_path}")
+        else:
+            print("⚠️ No matching tables found in the PDF.")
+        return
 
     # Save the extracted data to a JSON file
     if all_table_data:
@@ -98,9 +117,10 @@ def extract_transaction_table_with_plumber(input_pdf_path: str, output_json_path
         print("⚠️ No matching tables found in the PDF.")
 
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_json = r"C:\Users\Suren\Downloads\transactions_table_data.json"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_json = r"C:\Users\Suren\Downloads\transactions_table_data.json"
 
-# Execute the function
-extract_transaction_table_with_plumber(input_pdf, output_json)
+    # Execute the function
+    extract_transaction_table_with_plumber(input_pdf, output_json)
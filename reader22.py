@@ -1,9 +1,67 @@
 import pdfplumber
 import json
 import re
-from typing import List, Dict, Any
+from typing import BinaryIO, Any, Union, Optional, Pattern, Tuple
+from document_pool import pdf_file
+from instrumentation import metrics
+from table_output import open_table_writer
 
-def extract_transaction_table_with_plumber(input_pdf_path: str, output_json_path: str):
+def is_blue(color: Any) -> bool:
+    """
+    Checks whether a pdfplumber color is blue. Colors are tuples (or lists)
+    with components in 0..1; gray and CMYK colors are never blue.
+    """
+    if not isinstance(color, (list, tuple)) or len(color) != 3:
+        return False
+    # Allow for 0..255 components as well, like the original [0, 0, 255] check
+    r, g, b = (c / 255 if max(color) > 1 else c for c in color)
+    return r < 0.2 and g < 0.2 and b > 0.8
+
+def find_blue_rule_top(page: pdfplumber.page.Page) -> Optional[float]:
+    """
+    Finds the topmost blue horizontal rule on the page, drawn as a line, or as
+    a thin filled or stroked rectangle or path (generators often draw
+    rectangles as paths, which pdfplumber reports as curves). Taller shapes,
+    such as a shaded header box, are not rules, whatever their colour.
+
+    Returns:
+        float | None: The rule's top coordinate (from the top of the page), or None.
+    """
+    rule_top = None
+    # Each drawn object is looked at once (page.edges would repeat lines and
+    # rectangle sides); a rule must be wide and under 2 pt tall
+    for obj in page.lines + page.rects + page.curves:
+        if obj["width"] <= 100 or obj["height"] >= 2:
+            continue
+        if not (is_blue(obj.get("stroking_color")) or (obj.get("fill") and is_blue(obj.get("non_stroking_color")))):
+            continue
+        if rule_top is None or obj["top"] < rule_top:
+            rule_top = obj["top"]
+    return rule_top
+
+def find_header_bbox(page: pdfplumber.page.Page, blue_line_top: float, header_pattern: Pattern) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Finds the topmost header word above the blue rule on the right side of the
+    page (ending past 70% of the page width), from a single word extraction.
+
+    Returns:
+        tuple | None: The header's (x0, top, x1, bottom), or None.
+    """
+    min_x1 = page.width * 0.70
+    header = None
+    for word in page.extract_words():
+        if word["top"] >= blue_line_top or word["x1"] <= min_x1:
+            continue
+        if not header_pattern.search(word["text"]):
+            continue
+        if header is None or word["top"] < header["top"]:
+            header = word
+    if header is None:
+        return None
+    return (header["x0"], header["top"], header["x1"], header["bottom"])
+
+def extract_transaction_table_with_plumber(input_pdf_path: Union[str, bytes, memoryview, BinaryIO], output_json_path: str, output_format: str = "json",
+                                          batch_rows: Optional[int] = None):
     """
     Extracts a table from a PDF based on a 'TRANSACTIONS' header.
     The header must be in the top-right corner, above a blue horizontal line.
@@ -12,85 +70,54 @@ def extract_transaction_table_with_plumber(input_pdf_path: str, output_json_path
     based on their position and color.
 
     Args:
-        input_pdf_path (str): The path to the input PDF file.
+        input_pdf_path (str | bytes | memoryview | BinaryIO): The input PDF, as a path,
+            bytes-like object, memory map or binary stream (read without a temporary file).
         output_json_path (str): The path to the output JSON file.
+        output_format (str): "json" writes everything at the end (a single table
+            as a dict, several as a list). "jsonl" streams one table record per
+            line as each page finishes, "jsonl-rows" one row record per line.
+            "parquet" and "arrow" write typed columnar files (needs pyarrow).
+        batch_rows (int, optional): Rows per row group for "parquet" and "arrow"
+            (see columnar_output.ColumnarTableWriter).
     """
     all_table_data = []
+    table_writer = open_table_writer(output_json_path, output_format, batch_rows)
     
     # Use a flexible regex to find the header, ignoring case and whitespace
     header_pattern = re.compile(r"transactions", re.IGNORECASE)
 
     try:
-        with pdfplumber.open(input_pdf_path) as pdf:
+        with pdf_file(input_pdf_path) as f, pdfplumber.open(f) as pdf:
             for page_num, page in enumerate(pdf.pages):
                 print(f"🔎 Analyzing page {page_num + 1}...")
+                metrics.count("pages_scanned")
 
-                found_blue_line = False
-                blue_line_y = None
-                
-                # Search for a blue horizontal line near the top of the page
-                # The color is represented as a tuple of RGB values.
-                # Common blue is [0, 0, 255]. We'll be a bit flexible.
-                # A "blue" color check. Adjust the tolerance if needed.
-                is_blue = lambda c: isinstance(c, list) and c[0] < 50 and c[1] < 50 and c[2] > 200
-
-                # Look for a line that is horizontal and blue
-                for line in page.lines:
-                    # Check if the line is horizontal (start and end y are close)
-                    if abs(line["x0"] - line["x1"]) > 100 and abs(line["y0"] - line["y1"]) < 2:
-                        # Check if the color is blue
-                        if is_blue(line.get("stroke")):
-                            found_blue_line = True
-                            blue_line_y = line["y1"]
-                            print(f"✅ Found a blue line at y-coordinate: {blue_line_y}")
-                            break
-                
-                if not found_blue_line:
+                # Find the rule first: pages without one never pay for word extraction
+                with metrics.stage("rule_search"):
+                    blue_line_top = find_blue_rule_top(page)
+                if blue_line_top is None:
                     continue
+                print(f"✅ Found a blue line at y-coordinate: {blue_line_top}")
 
-                found_header = False
-                header_bbox = None
-                # Search for the "TRANSACTIONS" text block in the top-right corner
-                # `page.extract_text(layout=True)` provides block-level information including coordinates
-                
-                # Check blocks to find the header that meets the criteria
-                for block in page.extract_text(layout=True).split('\n'):
-                    # The block's layout info is lost, so we'll use a manual check against page text
-                    text_content = block.strip()
-                    if header_pattern.search(text_content):
-                        # Now, find the actual text block with coordinates
-                        words = page.extract_words()
-                        for word in words:
-                            if header_pattern.search(word['text']):
-                                # Check if the header is above the blue line and on the right side
-                                # Using a threshold of 70% of the page width
-                                if word['top'] < blue_line_y and word['x1'] > page.width * 0.70:
-                                    print(f"✅ Found 'TRANSACTIONS' header in the correct position.")
-                                    # Create a bounding box for the header
-                                    header_bbox = (word['x0'], word['top'], word['x1'], word['bottom'])
-                                    found_header = True
-                                    break
-                        if found_header:
-                            break
-                
-                if not found_header:
+                with metrics.stage("header_search"):
+                    header_bbox = find_header_bbox(page, blue_line_top, header_pattern)
+                if header_bbox is None:
                     print(f"⚠️ No 'TRANSACTIONS' header found matching position criteria on page {page_num + 1}.")
                     continue
+                print(f"✅ Found 'TRANSACTIONS' header in the correct position.")
+
+                if header_bbox[3] >= page.height:
+                    continue
+
+                # Look for tables only below the header: a single find_tables call on the
+                # cropped region, whose first table is the one below the header
+                table_region = page.crop((0, header_bbox[3], page.width, page.height))
+                with metrics.stage("find_tables"):
+                    tables = table_region.find_tables()
+                target_table = tables[0] if tables else None
 
-                # Find all tables on the page. We will assume the correct table is the first one found
-                # that is below our identified header.
-                tables = page.find_tables()
-                
-                # Find the first table below the header
-                target_table = None
-                for table in tables:
-                    # A table is below the header if its top y-coordinate is greater than the header's bottom y-coordinate
-                    # and the header bbox was found.
-                    if header_bbox and table.bbox[1] > header_bbox[3]:
-                        target_table = table
-                        break
-                
                 if target_table:
+                    metrics.count("pages_matched")
                     # Extract the raw table data as a list of lists
                     extracted_data = target_table.extract()
                     
@@ -108,7 +135,11 @@ def extract_transaction_table_with_plumber(input_pdf_path: str, output_json_path
                                     for i, value in enumerate(row):
                                         current_table_data[headers[i]].append(value.strip() if value else '')
                             
-                            all_table_data.append(current_table_data)
+                            if table_writer is not None:
+                                # Stream the table straight out instead of holding it in memory
+                                table_writer.write_table(page_num, 0, current_table_data)
+                            else:
+                                all_table_data.append(current_table_data)
 
     except FileNotFoundError:
         print(f"❌ Error: The file at '{input_pdf_path}' was not found.")
@@ -116,6 +147,16 @@ def extract_transaction_table_with_plumber(input_pdf_path: str, output_json_path
     except Exception as e:
         print(f"❌ An error occurred during PDF processing: {e}")
         return
+    finally:
+        if table_writer is not None:
+            table_writer.close()
+
+    if table_writer is not None:
+        if table_writer.tables_written:
+            print(f"✅ {table_writer.tables_written} table(s) streamed to: {output_json_path}")
+        else:
+            print("⚠️ No matching tables found in the PDF.")
+        return
 
     # Save the extracted data to a JSON file
     if all_table_data:
@@ -131,9 +172,10 @@ def extract_transaction_table_with_plumber(input_pdf_path: str, output_json_path
         print("⚠️ No matching tables found in the PDF.")
 
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_json = r"C:\Users\Suren\Downloads\transactions_table_data.json"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_json = r"C:\Users\Suren\Downloads\transactions_table_data.json"
 
-# Execute the function
-extract_transaction_table_with_plumber(input_pdf, output_json)
+    # Execute the function
+    extract_transaction_table_with_plumber(input_pdf, output_json)
@@ -1,12 +1,20 @@
 import fitz  # PyMuPDF
+from document_pool import open_document
+from page_analysis import PageAnalysis
 
 def extract_transactions_above_line(input_pdf_path, output_pdf_path, keyword="TRANSACTIONS"):
-    doc = fitz.open(input_pdf_path)
+    doc, owned = open_document(input_pdf_path)  # A path, bytes, memory map or stream
     output_doc = fitz.open()
 
     for page_num in range(len(doc)):
         page = doc.load_page(page_num)
-        blocks = page.get_text("blocks")  # Get text blocks with positions
+        analysis = PageAnalysis(page)  # Text is extracted once and reused below
+
+        # Skip pages without the keyword in the header band before extracting everything
+        if not analysis.header_band_contains(keyword, 0.15):
+            continue
+
+        blocks = analysis.blocks  # Get text blocks with positions
 
         # Define top region threshold (e.g., top 100 points of page)
         header_threshold = page.rect.height * 0.15
@@ -20,7 +28,7 @@ def extract_transactions_above_line(input_pdf_path, output_pdf_path, keyword="TR
 
         if found_header:
             # Extract full text from page (excluding header if needed)
-            lines = page.get_text().splitlines()
+            lines = analysis.text().splitlines()
             table_lines = []
 
             for line in lines:
@@ -47,11 +55,13 @@ def extract_transactions_above_line(input_pdf_path, output_pdf_path, keyword="TR
     else:
         print("⚠️ No pages with '{keyword}' in header region were found.")
 
-    doc.close()
+    if owned:
+        doc.close()
     output_doc.close()
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_pdf = r"C:\Users\Suren\Downloads\transactions_output.pdf"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\transactions_output.pdf"
 
-extract_transactions_above_line(input_pdf, output_pdf)
+    extract_transactions_above_line(input_pdf, output_pdf)
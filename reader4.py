@@ -1,12 +1,20 @@
 import fitz  # PyMuPDF
+from document_pool import open_document
+from page_analysis import PageAnalysis
 
 def extract_transactions_table_only(input_pdf_path, output_pdf_path):
-    doc = fitz.open(input_pdf_path)
+    doc, owned = open_document(input_pdf_path)  # A path, bytes, memory map or stream
     output_doc = fitz.open()
 
     for page_num in range(len(doc)):
         page = doc.load_page(page_num)
-        blocks = page.get_text("blocks")  # Get text blocks with positions
+        analysis = PageAnalysis(page)
+
+        # Skip pages without the keyword in the header band before extracting everything
+        if not analysis.header_band_contains("TRANSACTIONS", 0.15):
+            continue
+
+        blocks = analysis.blocks  # Get text blocks with positions
 
         # Define header region (top 15% of page height)
         header_threshold = page.rect.height * 0.15
@@ -44,11 +52,13 @@ def extract_transactions_table_only(input_pdf_path, output_pdf_path):
     else:
         print("⚠️ No pages with exact 'TRANSACTIONS' header found.")
 
-    doc.close()
+    if owned:
+        doc.close()
     output_doc.close()
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_pdf = r"C:\Users\Suren\Downloads\transactions_output.pdf"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\transactions_output.pdf"
 
-extract_transactions_table_only(input_pdf, output_pdf)
+    extract_transactions_table_only(input_pdf, output_pdf)
@@ -1,12 +1,20 @@
 import fitz  # PyMuPDF
+from document_pool import open_document
+from page_analysis import PageAnalysis
 
 def copy_transaction_pages_exactly(input_pdf_path, output_pdf_path):
-    doc = fitz.open(input_pdf_path)
+    doc, owned = open_document(input_pdf_path)  # A path, bytes, memory map or stream
     output_doc = fitz.open()
 
     for page_num in range(len(doc)):
         page = doc.load_page(page_num)
-        blocks = page.get_text("blocks")
+        analysis = PageAnalysis(page)
+
+        # Skip pages without the keyword in the header band before extracting everything
+        if not analysis.header_band_contains("TRANSACTIONS", 0.15):
+            continue
+
+        blocks = analysis.blocks
 
         header_threshold = page.rect.height * 0.15
         found_header = False
@@ -27,11 +35,13 @@ def copy_transaction_pages_exactly(input_pdf_path, output_pdf_path):
     else:
         print("⚠️ No matching pages found.")
 
-    doc.close()
+    if owned:
+        doc.close()
     output_doc.close()
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_pdf = r"C:\Users\Suren\Downloads\transactions_output.pdf"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\transactions_output.pdf"
 
-copy_transaction_pages_exactly(input_pdf, output_pdf)
+    copy_transaction_pages_exactly(input_pdf, output_pdf)
@@ -1,36 +1,49 @@
 import fitz  # PyMuPDF
+from pdf_output import ChunkedPdfWriter
+from table_crop import build_table_pages
 
-def extract_transaction_table_region(input_pdf_path, output_pdf_path):
-    doc = fitz.open(input_pdf_path)
-    output_doc = fitz.open()
+def find_table_rect(analysis):
+    page = analysis.page
 
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        blocks = page.get_text("blocks")
+    # Skip pages without the keyword in the header band before extracting everything
+    if not analysis.header_band_contains("TRANSACTIONS", 0.15):
+        return None
 
-        header_threshold = page.rect.height * 0.15
-        found_header = False
+    blocks = analysis.blocks
 
-        for block in blocks:
-            x0, y0, x1, y1, text, *_ = block
-            if text.strip() == "TRANSACTIONS" and y1 < header_threshold:
-                found_header = True
-                break
+    header_threshold = page.rect.height * 0.15
+    found_header = False
 
-        if found_header:
-            # Define table region: below header, above bottom
-            table_top = header_threshold + 10
-            table_bottom = page.rect.height - 50  # Leave margin
+    for block in blocks:
+        x0, y0, x1, y1, text, *_ = block
+        if text.strip() == "TRANSACTIONS" and y1 < header_threshold:
+            found_header = True
+            break
 
-            # Define crop rectangle
-            table_rect = fitz.Rect(0, table_top, page.rect.width, table_bottom)
+    if not found_header:
+        return None
 
-            # Render cropped region as image
-            pix = page.get_pixmap(clip=table_rect, dpi=300)
+    # Define table region: below header, above bottom
+    table_top = header_threshold + 10
+    table_bottom = page.rect.height - 50  # Leave margin
 
-            # Create new page and insert image
-            new_page = output_doc.new_page(width=page.rect.width, height=table_rect.height)
-            new_page.insert_image(fitz.Rect(0, 0, page.rect.width, table_rect.height), pixmap=pix)
+    # Define crop rectangle
+    return fitz.Rect(0, table_top, page.rect.width, table_bottom)
+
+def layout_table_page(output_doc, page_num, page_rect, table_rect):
+    # Create new page sized to the cropped region
+    new_page = output_doc.new_page(width=page_rect.width, height=table_rect.height)
+    return new_page, fitz.Rect(0, 0, page_rect.width, table_rect.height)
+
+def extract_transaction_table_region(input_pdf_path, output_pdf_path, workers=1, mode="raster", cache=None, render_policy=None, render_cache=None):
+    # Finished pages spill to disk in chunks, so memory stays flat on long statements
+    output_doc = ChunkedPdfWriter()
+
+    # Render cropped regions as images, or place them as vector content with mode="vector"
+    # (sharded over `workers` processes when > 1, with detection results cached in `cache`);
+    # a RenderPolicy picks the resolution, colourspace and compression of rendered regions,
+    # and a RenderCache keeps them, so a rerun with another layout renders nothing
+    build_table_pages(input_pdf_path, output_doc, find_table_rect, layout_table_page, workers=workers, mode=mode, cache=cache, render_policy=render_policy, render_cache=render_cache)
 
     if output_doc.page_count > 0:
         output_doc.save(output_pdf_path)
@@ -38,11 +51,11 @@ def extract_transaction_table_region(input_pdf_path, output_pdf_path):
     else:
         print("⚠️ No matching pages found.")
 
-    doc.close()
     output_doc.close()
 
-# 🔧 Replace with your actual paths
-input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
-output_pdf = r"C:\Users\Suren\Downloads\transactions_table_only.pdf"
+if __name__ == "__main__":
+    # 🔧 Replace with your actual paths
+    input_pdf = r"C:\Users\Suren\Downloads\input.pdf"
+    output_pdf = r"C:\Users\Suren\Downloads\transactions_table_only.pdf"
 
-extract_transaction_table_region(input_pdf, output_pdf)
+    extract_transaction_table_region(input_pdf, output_pdf)
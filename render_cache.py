@@ -0,0 +1,110 @@
+import fitz  # PyMuPDF
+import hashlib
+import json
+import zlib
+from document_pool import document_path, pdf_input
+from instrumentation import metrics
+from render_policy import EncodedImage, StripImage
+from result_cache import MISS, ResultCache, cache_key, file_digest
+
+
+def document_digest(source):
+    """
+    SHA-256 of a PDF input's bytes: a path's file, or the buffer of bytes, a
+    memory map or a stream. None for a document opened from memory, whose
+    bytes are no longer at hand.
+    """
+    path = document_path(source)
+    if path is not None:
+        return file_digest(path)
+    with pdf_input(source) as source:
+        if isinstance(source, fitz.Document):
+            return None
+        return hashlib.sha256(source).hexdigest()
+
+
+def render_key(digest, page_num, clip, dpi, render_policy=None):
+    """
+    Cache key of one rendered region: the source document, page, clip
+    rectangle, and the resolution or (with a policy) the policy settings.
+    """
+    settings = vars(render_policy) if render_policy is not None else {"dpi": dpi}
+    return cache_key("render", digest, page_num, [round(value, 3) for value in clip], settings)
+
+
+class RenderCache(ResultCache):
+    """
+    Persistent, size-bounded LRU cache of rendered table regions.
+
+    Regions are stored compressed, in the PDF encoding they are placed with
+    (see render_policy.EncodedImage), so a hit is inserted without any
+    rendering or re-encoding. Keys cover what the pixels depend on (see
+    render_key) and nothing about the output layout, so re-running a crop
+    with different padding, titles or page sizes renders nothing again.
+
+    Use a separate file from the ResultCache of detection results: entries
+    here are binary, not JSON.
+
+    Args:
+        path (str): The path to the SQLite cache file (created if missing).
+        max_bytes (int): Upper bound on the total size of stored images.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024):
+        super().__init__(path, max_bytes)
+
+    def _dumps(self, image):
+        # A JSON header line describing the image, then its streams back to back
+        if isinstance(image, StripImage):
+            header = {
+                "kind": "strips", "width": image.width, "height": image.height,
+                "strips": [[top, *strip[:5], len(strip.data)] for top, strip in image.strips],
+            }
+            streams = [strip.data for _, strip in image.strips]
+        else:
+            header, streams = {"kind": "encoded", "image": [*image[:5], len(image.data)]}, [image.data]
+        return json.dumps(header).encode("utf-8") + b"\n" + b"".join(streams)
+
+    def _loads(self, data):
+        end = data.index(b"\n")
+        header = json.loads(data[:end])
+        data = memoryview(data)
+        position = end + 1
+
+        def read(length):
+            nonlocal position
+            position += length
+            return data[position - length:position].tobytes()
+
+        if header["kind"] == "encoded":
+            *fields, length = header["image"]
+            return EncodedImage(*fields, read(length))
+        strips = []
+        for top, *fields, length in header["strips"]:
+            strips.append((top, EncodedImage(*fields, read(length))))
+        return StripImage(header["width"], header["height"], strips)
+
+
+def encode_pixmap(pix):
+    """A pixmap as a Flate-compressed EncodedImage, to store and place instead of the raw samples."""
+    with metrics.stage("encode"):
+        data = zlib.compress(pix.samples_mv)
+    colorspace = {1: "/DeviceGray", 3: "/DeviceRGB", 4: "/DeviceCMYK"}[pix.colorspace.n]
+    return EncodedImage(pix.width, pix.height, colorspace, 8, "/FlateDecode", data)
+
+
+def cached_render(render_cache, key, render):
+    """
+    Returns the image render() produces for a region, through `render_cache`.
+    A pixmap is stored Flate-encoded and returned encoded on a miss as on a
+    hit, so cold and warm runs produce the same output.
+    """
+    image = render_cache.get(key)
+    if image is not MISS:
+        metrics.count("render_cache_hits")
+        return image
+    image = render()
+    if isinstance(image, fitz.Pixmap):
+        image = encode_pixmap(image)
+    render_cache.put(key, image)
+    return image
@@ -0,0 +1,223 @@
+import fitz  # PyMuPDF
+import math
+import zlib
+from collections import namedtuple
+from instrumentation import metrics
+from page_analysis import PageAnalysis
+
+# A rendered region, already in its PDF encoding, ready for insert_encoded_image.
+# Plain data, so it crosses process boundaries as is
+EncodedImage = namedtuple("EncodedImage", "width height colorspace bpc filter data")
+
+# A region rendered as horizontal strips: `strips` holds (first row, EncodedImage)
+# pairs that together cover the width x height pixels of the whole region
+StripImage = namedtuple("StripImage", "width height strips")
+
+# Default pixel budget per render: regions over it are rendered in horizontal strips
+MAX_STRIP_PIXELS = 4 * 1024 * 1024
+
+# Gray level -> "0" (black) or "1" (white) for each threshold, for packing 1-bit rows
+_MONO_TABLES = {}
+
+
+def _mono_table(threshold):
+    if threshold not in _MONO_TABLES:
+        _MONO_TABLES[threshold] = bytes(ord("0") if level < threshold else ord("1") for level in range(256))
+    return _MONO_TABLES[threshold]
+
+
+def pack_mono(pix, threshold=160):
+    """
+    Thresholds a grayscale pixmap into 1-bit rows, as a DeviceGray image with
+    BitsPerComponent 1 stores them: 0 is black, every row padded to a byte.
+    """
+    width, height, stride = pix.width, pix.height, pix.stride
+    table = _mono_table(threshold)
+    padding = b"1" * (-width % 8)
+    row_bytes = (width + 7) // 8
+    samples = pix.samples_mv
+    # Each row becomes a string of binary digits; int() packs them into bits in C
+    return b"".join(
+        int(bytes(samples[y * stride:y * stride + width]).translate(table) + padding, 2).to_bytes(row_bytes, "big")
+        for y in range(height)
+    )
+
+
+class RenderPolicy:
+    """
+    How the raster-crop path renders and stores a table region.
+
+    Pixmap cost grows with the square of the resolution, so by default the
+    resolution is chosen per region: just high enough that the smallest
+    font size in the region (from the span sizes) is `target_glyph_px`
+    pixels tall, between `min_dpi` and `max_dpi`. Body text at 10 pt comes
+    out at about 144 dpi instead of 300, a quarter of the pixels.
+
+    The region is rendered straight into the target colourspace and stored
+    compressed: "rgb", "gray" (a third of the samples) or "mono" (1 bit per
+    pixel, thresholded; meant for black-on-white tables). Compression is
+    "flate" (lossless), "jpeg" (lossy, for photographic content; not with
+    "mono") or "auto", which picks JPEG for regions mostly covered by images
+    on the source page (more than `jpeg_min_coverage` of the area) and Flate
+    otherwise, so a logo beside a text table does not make the table lossy. MuPDF cannot encode JBIG2, so
+    bilevel pages use Flate over packed 1-bit rows instead.
+
+    A region of more than `max_strip_pixels` pixels (a tall crop, or a large
+    custom page size) is rendered as horizontal strips of at most that many
+    pixels from one display list, and each strip is encoded before the next
+    one is rendered. Peak memory then depends on the strip size, not on the
+    region size. The strips are placed edge to edge on the output page.
+
+    Args:
+        dpi (int, optional): A fixed resolution instead of the adaptive one.
+        target_glyph_px (float): Pixel height for the smallest font size in the region.
+        min_dpi (int): Lower bound for the adaptive resolution.
+        max_dpi (int): Upper bound, also used for regions without text.
+        colorspace (str): "rgb", "gray" or "mono".
+        compression (str): "auto", "flate" or "jpeg".
+        jpeg_quality (int): JPEG quality, 1..100.
+        jpeg_min_coverage (float): Share of the region images must cover for
+            "auto" to pick JPEG.
+        mono_threshold (int): Gray level below which a "mono" pixel is black.
+        max_strip_pixels (int, optional): Pixel budget per render; None renders
+            every region in one piece.
+    """
+
+    def __init__(self, dpi=None, target_glyph_px=20, min_dpi=72, max_dpi=300, colorspace="gray",
+                 compression="auto", jpeg_quality=75, jpeg_min_coverage=0.5, mono_threshold=160,
+                 max_strip_pixels=MAX_STRIP_PIXELS):
+        if colorspace not in ("rgb", "gray", "mono"):
+            raise ValueError(f"Unknown colorspace: {colorspace!r}")
+        if compression not in ("auto", "flate", "jpeg"):
+            raise ValueError(f"Unknown compression: {compression!r}")
+        if colorspace == "mono" and compression == "jpeg":
+            raise ValueError("1-bit images cannot be stored as JPEG")
+        self.dpi = dpi
+        self.target_glyph_px = target_glyph_px
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+        self.colorspace = colorspace
+        self.compression = compression
+        self.jpeg_quality = jpeg_quality
+        self.jpeg_min_coverage = jpeg_min_coverage
+        self.mono_threshold = mono_threshold
+        self.max_strip_pixels = max_strip_pixels
+
+    def __repr__(self):
+        settings = ", ".join(f"{name}={value!r}" for name, value in vars(self).items())
+        return f"RenderPolicy({settings})"
+
+    def choose_dpi(self, analysis, clip):
+        """The resolution for region `clip` of the page behind `analysis` (a PageAnalysis)."""
+        if self.dpi is not None:
+            return self.dpi
+
+        clip = fitz.Rect(clip)
+        sizes = [
+            span["size"] for span in analysis.spans
+            if span["text"].strip() and clip.intersects(span["bbox"])
+        ]
+        if not sizes:
+            return self.max_dpi  # Nothing to measure, e.g. a scanned page
+        dpi = math.ceil(self.target_glyph_px * 72 / min(sizes))
+        return max(self.min_dpi, min(self.max_dpi, dpi))
+
+    def choose_compression(self, page, clip):
+        """Resolves the compression for region `clip` to "flate" or "jpeg"."""
+        if self.colorspace == "mono" or self.compression != "auto":
+            return "flate" if self.colorspace == "mono" else self.compression
+        clip = fitz.Rect(clip)
+        if clip.is_empty:
+            return "flate"
+        # Overlapping images may count twice; that only matters near the threshold
+        covered = sum((clip & fitz.Rect(info["bbox"])).get_area() for info in page.get_image_info())
+        return "jpeg" if covered > self.jpeg_min_coverage * clip.get_area() else "flate"
+
+    def render(self, page, clip, analysis=None):
+        """
+        Renders region `clip` of `page` and encodes it.
+
+        Args:
+            page (fitz.Page): The source page.
+            clip (fitz.Rect): The region to render.
+            analysis (PageAnalysis, optional): The page's analysis, reused for span sizes.
+
+        Returns:
+            EncodedImage | StripImage: The encoded region (in strips if it is over
+            the pixel budget), for insert_encoded_image.
+        """
+        if self.dpi is None and analysis is None:
+            analysis = PageAnalysis(page)
+        clip = fitz.Rect(clip)
+        dpi = self.choose_dpi(analysis, clip)
+        compression = self.choose_compression(page, clip)
+        colorspace = fitz.csRGB if self.colorspace == "rgb" else fitz.csGRAY
+
+        zoom = dpi / 72
+        matrix = fitz.Matrix(zoom, zoom)
+        region = (clip * matrix).irect  # The pixel rows and columns a single render would cover
+        strip_rows = max(1, self.max_strip_pixels // max(1, region.width)) if self.max_strip_pixels else region.height
+        if region.height <= strip_rows:
+            with metrics.stage("get_pixmap"):
+                pix = page.get_pixmap(clip=clip, dpi=dpi, colorspace=colorspace)
+            metrics.count("bytes_rendered", pix.stride * pix.height)
+            return self._encode(pix, compression)
+
+        # The page is interpreted once; every strip is rasterised from the display list
+        display_list = page.get_displaylist()
+        strips = []
+        for top in range(region.y0, region.y1, strip_rows):
+            # Strip edges fall on whole device pixels, so the strips tile the region exactly;
+            # inner edges are pulled in by 0.01 px so outward rounding cannot add a row
+            strip_clip = fitz.Rect(
+                clip.x0, max(clip.y0, (top + 0.01) / zoom), clip.x1, min(clip.y1, (top + strip_rows - 0.01) / zoom)
+            )
+            with metrics.stage("get_pixmap"):
+                pix = display_list.get_pixmap(matrix=matrix, colorspace=colorspace, alpha=False, clip=strip_clip)
+            metrics.count("bytes_rendered", pix.stride * pix.height)
+            strips.append((pix.y - region.y0, self._encode(pix, compression)))
+            pix = None  # Only the encoded strip is kept
+        return StripImage(region.width, region.height, strips)
+
+    def _encode(self, pix, compression):
+        with metrics.stage("encode"):
+            if compression == "jpeg":
+                data, bpc, image_filter = pix.tobytes("jpeg", jpg_quality=self.jpeg_quality), 8, "/DCTDecode"
+            elif self.colorspace == "mono":
+                data, bpc, image_filter = zlib.compress(pack_mono(pix, self.mono_threshold)), 1, "/FlateDecode"
+            else:
+                data, bpc, image_filter = zlib.compress(pix.samples_mv), 8, "/FlateDecode"
+
+        colorspace = "/DeviceRGB" if self.colorspace == "rgb" else "/DeviceGray"
+        return EncodedImage(pix.width, pix.height, colorspace, bpc, image_filter, data)
+
+
+def insert_encoded_image(page, rect, image):
+    """
+    Places an EncodedImage or StripImage on `page` in `rect`. Encoded data
+    becomes the image stream as is, so nothing is decoded or compressed
+    again. Like insert_image, the image keeps its proportions and is
+    centred in `rect`; strips are stacked edge to edge within that area.
+    """
+    if isinstance(image, StripImage):
+        rect = fitz.Rect(rect)
+        scale = min(rect.width / image.width, rect.height / image.height)
+        x0 = rect.x0 + (rect.width - image.width * scale) / 2
+        y0 = rect.y0 + (rect.height - image.height * scale) / 2
+        for top, strip in image.strips:
+            strip_rect = fitz.Rect(x0, y0 + top * scale, x0 + strip.width * scale, y0 + (top + strip.height) * scale)
+            _insert_image_stream(page, strip_rect, strip)
+        return
+    _insert_image_stream(page, rect, image)
+
+
+def _insert_image_stream(page, rect, image):
+    doc = page.parent
+    xref = doc.get_new_xref()
+    doc.update_object(xref, (
+        f"<</Type/XObject/Subtype/Image/Width {image.width}/Height {image.height}"
+        f"/ColorSpace{image.colorspace}/BitsPerComponent {image.bpc}>>"
+    ))
+    doc.update_stream(xref, image.data, compress=False)
+    doc.xref_set_key(xref, "Filter", image.filter)  # Set after the stream, which resets it
+    page.insert_image(rect, xref=xref)
@@ -0,0 +1,301 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import re
+import sqlite3
+import time
+from document_pool import document_path, open_document
+from instrumentation import metrics
+
+# Returned by ResultCache.get on a miss; cached results may legitimately be None
+MISS = object()
+
+# Indirect references ("12 0 R") in an object's source, and the /Parent entry whose reference is not followed
+_REFERENCE = re.compile(r"(\d+) \d+ R")
+_PARENT = re.compile(r"/Parent\s+\d+ \d+ R")
+
+# Modules from this directory count towards function fingerprints
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def file_digest(path):
+    """SHA-256 of a file's bytes, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _page_resources(doc, xref):
+    # The page's /Resources entry, inherited from the page tree if the page has none
+    while xref:
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return value
+        kind, parent = doc.xref_get_key(xref, "Parent")
+        xref = int(parent.split()[0]) if kind == "xref" else 0
+    return ""
+
+
+def _object_digest(doc, xref, digests):
+    # SHA-256 of an object and everything it references, with each reference
+    # replaced by the referenced object's digest, so equal content hashes
+    # equally whatever its xref numbers. /Parent links are not followed.
+    digest = digests.get(xref)
+    if digest is not None:
+        return digest
+    digests[xref] = "cycle"  # What a reference back to an object still being hashed resolves to
+    source = _PARENT.sub("", doc.xref_object(xref, compressed=True))
+    object_digest = hashlib.sha256(_resolve_references(doc, source, digests).encode())
+    if doc.xref_is_stream(xref):
+        object_digest.update(doc.xref_stream_raw(xref) or b"")
+    digests[xref] = object_digest.hexdigest()
+    return digests[xref]
+
+
+def _resolve_references(doc, source, digests):
+    def resolve(match):
+        xref = int(match.group(1))
+        return _object_digest(doc, xref, digests) if 0 < xref < doc.xref_length() else "null"
+    return _REFERENCE.sub(resolve, source)
+
+
+def page_digest(doc, page):
+    """
+    SHA-256 of what a page draws: its size and rotation, content streams and
+    every object reachable from its resources (fonts with their ToUnicode
+    maps and font files, images, Form XObjects and their own resources).
+
+    Objects are hashed by content, not by xref number, so an identical page
+    has the same digest in any document, and pages keep their digest when
+    other pages are added or edited. Each resource object is hashed once per
+    open document (documents are assumed not to be edited while digests are
+    taken); an incremental update is a newly opened document, so a font or
+    XObject replaced under the same xref changes the digest of every page
+    using it.
+    """
+    digests = getattr(doc, "_object_digests", None)
+    if digests is None:
+        digests = doc._object_digests = {}
+
+    digest = hashlib.sha256()
+    digest.update(f"{tuple(page.mediabox)}:{tuple(page.cropbox)}:{page.rotation}".encode())
+    for xref in page.get_contents():
+        digest.update(doc.xref_stream(xref) or b"")
+    digest.update(_resolve_references(doc, _page_resources(doc, page.xref), digests).encode())
+    return digest.hexdigest()
+
+
+def _code_fingerprint(code, digest):
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            _code_fingerprint(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+def _project_module(obj):
+    # The module defining `obj` if it is a source file of this project, else None
+    module = inspect.getmodule(obj)
+    path = getattr(module, "__file__", None)
+    if path is None:
+        return None
+    path = os.path.abspath(path)
+    return module if os.path.commonpath([path, _PROJECT_DIR]) == _PROJECT_DIR and "site-packages" not in path else None
+
+
+@functools.lru_cache(maxsize=None)
+def _source_digest(path, mtime_ns, size):
+    # Keyed on the file's mtime and size, so an edited module is hashed again
+    return file_digest(path)
+
+
+def _module_closure(module):
+    # `module` and every project module it uses, through imported modules, functions or classes
+    modules = {module.__name__: module}
+    pending = [module]
+    while pending:
+        for value in list(vars(pending.pop()).values()):
+            if not (inspect.ismodule(value) or inspect.isfunction(value) or inspect.isclass(value)):
+                continue
+            used = _project_module(value)
+            if used is not None and used.__name__ not in modules:
+                modules[used.__name__] = used
+                pending.append(used)
+    return modules
+
+
+def function_fingerprint(func):
+    """
+    Identifies an extraction function by its module, name and bytecode, and
+    by the source of every project module it depends on.
+
+    Keywords, thresholds, dpi and stop markers live as constants in the
+    reader functions, and helpers and module-level settings (PageAnalysis,
+    segment_table, header bands) in the modules they import. Editing any of
+    them changes the fingerprint and invalidates results computed with the
+    old code; editing an unrelated project module may invalidate them too.
+    """
+    digest = hashlib.sha256()
+    if isinstance(func, functools.partial):
+        digest.update(repr((func.args, sorted(func.keywords.items()))).encode())
+        func = func.func
+    digest.update(f"{func.__module__}.{func.__qualname__}".encode())
+    _code_fingerprint(func.__code__, digest)
+
+    module = _project_module(func)
+    for name, used in sorted(_module_closure(module).items()) if module is not None else ():
+        stat = os.stat(used.__file__)
+        digest.update(f"{name}:{_source_digest(os.path.abspath(used.__file__), stat.st_mtime_ns, stat.st_size)}".encode())
+    return digest.hexdigest()
+
+
+def cache_key(*parts):
+    """Stable key for any JSON-serialisable combination of parts."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent, size-bounded LRU cache of JSON-serialisable extraction results.
+
+    Entries live in a SQLite file, so several jobs and worker processes can
+    share one cache. When the stored values exceed `max_bytes`, the least
+    recently used entries are evicted.
+
+    Args:
+        path (str): The path to the SQLite cache file (created if missing).
+        max_bytes (int): Upper bound on the total size of stored values.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = None
+
+    def __getstate__(self):
+        # Worker processes reopen the database on first use
+        return {"path": self.path, "max_bytes": self.max_bytes, "_conn": None}
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key, default=MISS):
+        row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+
+        with self.conn:
+            self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return self._loads(row[0])
+
+    def put(self, key, value):
+        data = self._dumps(value)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+        self._evict()
+
+    def _dumps(self, value):
+        # Subclasses storing other kinds of values override _dumps and _loads
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    def _loads(self, data):
+        return json.loads(data)
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        with self.conn:
+            rows = self.conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall()
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def cached_page_result(cache, doc, page, params, compute):
+    """
+    Returns compute() for a page, through `cache` when one is given.
+
+    The entry is keyed on the page's content digest and `params`, so it is
+    shared by every document containing an identical page.
+    """
+    if cache is None:
+        return compute()
+
+    key = cache_key("page", params, page_digest(doc, page))
+    result = cache.get(key)
+    if result is MISS:
+        result = compute()
+        cache.put(key, result)
+    return result
+
+
+def iter_page_results(input_pdf_path, parse_page, cache=None):
+    """
+    Yields (page_num, result) for every page where `parse_page(page_num, page)`
+    returns something other than None, in page order.
+
+    With a cache, a document seen before with the same parse function is
+    answered from a single whole-document entry without opening the PDF.
+    Otherwise each page is looked up by its content digest and only pages
+    not seen before are parsed.
+
+    `input_pdf_path` may also be an open fitz.Document, which is left open.
+    """
+    params = function_fingerprint(parse_page) if cache is not None else None
+    path = document_path(input_pdf_path)
+    document_key = None
+    if cache is not None and path is not None:
+        document_key = cache_key("document", params, file_digest(path))
+        results = cache.get(document_key)
+        if results is not MISS:
+            for page_num, result in results:
+                yield page_num, result
+            return
+
+    doc, owned = open_document(input_pdf_path)
+    results = []
+    try:
+        for page_num in range(len(doc)):
+            page = doc.load_page(page_num)
+            metrics.count("pages_scanned")
+            with metrics.stage("parse"):
+                result = cached_page_result(cache, doc, page, params, lambda: parse_page(page_num, page))
+            if result is not None:
+                metrics.count("pages_matched")
+                results.append([page_num, result])
+                yield page_num, result
+    finally:
+        if owned:
+            doc.close()
+
+    # Only a fully consumed run is stored for the whole document
+    if document_key is not None:
+        cache.put(document_key, results)
@@ -0,0 +1,290 @@
+import fitz  # PyMuPDF
+import argparse
+import contextlib
+import io
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import reader16
+import reader20
+from document_pool import DocumentPool
+from instrumentation import Metrics, metrics
+from jsonl_output import table_records
+from result_cache import ResultCache, cached_page_result, function_fingerprint
+from table_crop import build_table_pages
+
+# Page tasks submitted ahead of the response being written, per worker
+PAGES_AHEAD_PER_WORKER = 2
+
+# Per-worker state, set up once by _init_worker in every pool process
+_documents = None
+_cache = None
+_params = None
+
+
+def _init_worker(max_documents, cache_path, collect_metrics):
+    global _documents, _cache, _params
+    _documents = DocumentPool(max_documents)
+    _cache = ResultCache(cache_path) if cache_path else None
+    _params = function_fingerprint(reader20.parse_page_table) if _cache is not None else None
+    metrics.enabled = collect_metrics
+
+
+def _measured(extract, *args):
+    # Each task reports the worker's metrics for itself alone; the server adds them up
+    metrics.reset()
+    result = extract(*args)
+    return result, metrics.snapshot() if metrics.enabled else None
+
+
+def _page_count(path):
+    return len(_documents.get(path))
+
+
+def _extract_page_tables(path, page_num, records):
+    # Same parsing as reader20.extract_transaction_table_to_json for one page, one JSON Lines record per line
+    doc = _documents.get(path)
+    page = doc.load_page(page_num)
+    metrics.count("pages_scanned")
+    with contextlib.redirect_stdout(io.StringIO()), metrics.stage("parse"):
+        table_data = cached_page_result(_cache, doc, page, _params, lambda: reader20.parse_page_table(page_num, page))
+    if table_data is None:
+        return []
+    metrics.count("pages_matched")
+    return [json.dumps(record, ensure_ascii=False) for record in table_records(page_num, 0, table_data, records)]
+
+
+def _extract_region(path, mode):
+    # Same output as reader16.extract_transaction_table_region, returned as PDF bytes
+    doc = _documents.get(path)
+    output_doc = fitz.open()
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_table_pages(
+            doc, output_doc, reader16.find_table_rect, reader16.layout_table_page, mode=mode, cache=_cache
+        )
+    data = output_doc.tobytes() if output_doc.page_count > 0 else None
+    output_doc.close()
+    return data
+
+
+class ExtractionHandler(BaseHTTPRequestHandler):
+    """
+    GET /tables?path=<pdf>[&records=table|row]  ->  application/x-ndjson
+    GET /region?path=<pdf>[&mode=raster|vector] ->  application/pdf (204 if no table)
+    GET /health                                 ->  {"status": "ok"}
+    GET /metrics                                ->  Prometheus text format (empty unless enabled)
+
+    `path` is relative to the server's root directory; paths that resolve
+    outside it (through "..", absolute paths or symlinks) are rejected.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/health":
+            self._send_json(200, {"status": "ok"})
+            return
+        if url.path == "/metrics":
+            self._send_metrics()
+            return
+        if url.path not in ("/tables", "/region"):
+            self._send_json(404, {"error": f"Unknown endpoint: {url.path}"})
+            return
+
+        path = query.get("path")
+        if not path:
+            self._send_json(400, {"error": "Missing 'path' parameter"})
+            return
+        full_path = self.server.resolve(path)
+        if full_path is None:
+            self._send_json(403, {"error": f"Outside the server root: {path}"})
+            return
+        if not os.path.isfile(full_path):
+            self._send_json(404, {"error": f"No such file: {path}"})
+            return
+        path = full_path
+
+        try:
+            if url.path == "/tables":
+                records = query.get("records", "table")
+                if records not in ("table", "row"):
+                    raise ValueError(f"Unknown record type: {records!r}")
+                page_count = self.server.run(_page_count, path)
+                pages = self.server.run_each(_extract_page_tables, [(path, page_num, records) for page_num in range(page_count)])
+                try:
+                    self._send_lines(line for lines in pages for line in lines)
+                finally:
+                    pages.close()  # Cancels the pages still queued if the response was cut short
+            else:
+                mode = query.get("mode", "raster")
+                if mode not in ("raster", "vector"):
+                    raise ValueError(f"Unknown crop mode: {mode!r}")
+                data = self.server.run(_extract_region, path, mode)
+                self._send_pdf(data)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_metrics(self):
+        with self.server.metrics_lock:
+            data = self.server.metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_lines(self, lines):
+        # Chunked transfer, one chunk per record, written as each page's records arrive
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for line in lines:
+                chunk = (line + "\n").encode("utf-8")
+                self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+        except Exception as e:
+            # The status is sent already: end the connection without the final chunk,
+            # so the client sees a truncated response rather than a complete one
+            self.log_error("Extraction failed mid-response: %s: %s", type(e).__name__, e)
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_pdf(self, data):
+        if data is None:
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ExtractionServer(ThreadingHTTPServer):
+    """
+    HTTP front end for the extractors, backed by a pool of warm worker processes.
+
+    Request threads only parse and answer HTTP; the PDF work runs in
+    `workers` processes that import PyMuPDF once and each keep an LRU pool of
+    up to `max_documents` open documents, so a repeat request for the same
+    statement skips start-up, imports and fitz.open. PyMuPDF is not
+    thread-safe, which is why documents never leave their worker process.
+
+    /tables runs one task per page, a few pages ahead of the response, and
+    streams each page's records as soon as that page and those before it
+    are done; no process holds the whole document's output.
+
+    Args:
+        address (tuple): The (host, port) to listen on.
+        root (str): The directory request paths are resolved in; nothing outside it is served.
+        workers (int, optional): Worker process count; defaults to the CPU count.
+        max_documents (int): Open documents kept per worker.
+        cache_path (str, optional): A ResultCache file shared by all workers.
+        collect_metrics (bool): Record stage timings and counters in the workers
+            and serve their totals on /metrics.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, root, workers=None, max_documents=32, cache_path=None, collect_metrics=False):
+        super().__init__(address, ExtractionHandler)
+        self.root = os.path.realpath(root)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(max_documents, cache_path, collect_metrics),
+        )
+        self.metrics = Metrics(enabled=collect_metrics)
+        self.metrics_lock = threading.Lock()
+
+    def resolve(self, path):
+        """The real path of `path` under the server root, or None if it lies outside."""
+        full_path = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, full_path]) != self.root:
+            return None
+        return full_path
+
+    def run(self, extract, *args):
+        """Runs `extract(*args)` in a worker process and adds its metrics to the server's."""
+        return self._result(self.executor.submit(_measured, extract, *args))
+
+    def run_each(self, extract, arg_tuples):
+        """
+        Yields `extract(*args)` for every tuple in `arg_tuples`, in order, with
+        a few tasks running ahead in the workers. Closing the generator (e.g.
+        when the client disconnects) cancels the tasks not yet started.
+        """
+        arg_tuples = iter(arg_tuples)
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < self.workers * PAGES_AHEAD_PER_WORKER:
+                    args = next(arg_tuples, None)
+                    if args is None:
+                        break
+                    pending.append(self.executor.submit(_measured, extract, *args))
+                if not pending:
+                    return
+                yield self._result(pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _result(self, future):
+        result, worker_metrics = future.result()
+        with self.metrics_lock:
+            self.metrics.merge(worker_metrics)
+        return result
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the table extractors over HTTP with warm worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--root", required=True, help="Directory the requested PDF paths are resolved in")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-documents", type=int, default=32, help="Open documents kept per worker")
+    parser.add_argument("--cache", default=None, help="Optional ResultCache file for extraction results")
+    parser.add_argument("--metrics", action="store_true", help="Record stage timings and counters, served on /metrics")
+    args = parser.parse_args()
+
+    with ExtractionServer(
+        (args.host, args.port), args.root, workers=args.workers, max_documents=args.max_documents, cache_path=args.cache,
+        collect_metrics=args.metrics,
+    ) as server:
+        print(f"✅ Serving {server.root} on http://{args.host}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
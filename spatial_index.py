@@ -0,0 +1,92 @@
+from bisect import bisect_left, bisect_right
+
+
+def _tuple_bbox(item):
+    return item[:4]
+
+
+class SpatialIndex:
+    """
+    Index over the bounding boxes of a page's blocks, lines or words for
+    rectangle, band and nearest-below lookups.
+
+    Items are kept sorted by their top edge together with the tallest item's
+    height, so every item that can reach into a vertical band lies in one
+    contiguous run found by binary search. below() and nearest_below() cost
+    a binary search plus the items returned or skipped. band() and query()
+    also scan every item starting up to one tallest-item height above the
+    window, so a single tall block (a sidebar, a full-page frame) widens
+    every such scan, up to the whole page. Page text runs in rows, which
+    this structure fits without the overhead of a general R-tree.
+
+    Building the index sorts the items, O(n log n), so it pays off only for
+    a page that is queried several times (see PageAnalysis.block_index);
+    for a single question a linear filter over the items is cheaper.
+
+    Results come top to bottom (ties in original order), which is what
+    sorted(items, key=lambda b: b[1]) gives. With reading_order=True they
+    come in the original order instead, for code written against the
+    unsorted list.
+
+    Args:
+        items (list): Block or word tuples, or any items with a bounding box.
+        bbox (callable, optional): Returns an item's (x0, y0, x1, y1); defaults
+            to the first four fields, as in page.get_text("blocks"/"words").
+    """
+
+    def __init__(self, items, bbox=_tuple_bbox):
+        self.items = list(items)
+        self._bboxes = [tuple(bbox(item)) for item in self.items]
+        self._order = sorted(range(len(self.items)), key=lambda i: self._bboxes[i][1])
+        self._tops = [self._bboxes[i][1] for i in self._order]
+        self._max_height = max((y1 - y0 for _, y0, _, y1 in self._bboxes), default=0)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def by_top(self):
+        """Every item, sorted top to bottom."""
+        return [self.items[i] for i in self._order]
+
+    def _results(self, indexes, reading_order):
+        if reading_order:
+            indexes = sorted(indexes)
+        return [self.items[i] for i in indexes]
+
+    def below(self, y, reading_order=False):
+        """Items whose top edge is below `y` (y0 > y)."""
+        start = bisect_right(self._tops, y)
+        return self._results(self._order[start:], reading_order)
+
+    def above(self, y, reading_order=False):
+        """Items that end at or above `y` (y1 <= y)."""
+        stop = bisect_right(self._tops, y)
+        indexes = [i for i in self._order[:stop] if self._bboxes[i][3] <= y]
+        return self._results(indexes, reading_order)
+
+    def band(self, y_min, y_max, reading_order=False):
+        """Items that overlap the horizontal band from `y_min` to `y_max`."""
+        # No item starting above y_min - max_height can reach down into the band
+        start = bisect_left(self._tops, y_min - self._max_height)
+        stop = bisect_right(self._tops, y_max)
+        indexes = [i for i in self._order[start:stop] if self._bboxes[i][3] >= y_min]
+        return self._results(indexes, reading_order)
+
+    def query(self, rect, reading_order=False):
+        """Items that overlap `rect`, given as (x0, y0, x1, y1) or a fitz.Rect."""
+        x0, y0, x1, y1 = rect
+        start = bisect_left(self._tops, y0 - self._max_height)
+        stop = bisect_right(self._tops, y1)
+        indexes = [
+            i for i in self._order[start:stop]
+            if self._bboxes[i][3] >= y0 and self._bboxes[i][0] <= x1 and self._bboxes[i][2] >= x0
+        ]
+        return self._results(indexes, reading_order)
+
+    def nearest_below(self, y, predicate=None):
+        """The topmost item starting below `y` (y0 > y) that satisfies `predicate`, or None."""
+        for i in self._order[bisect_right(self._tops, y):]:
+            if predicate is None or predicate(self.items[i]):
+                return self.items[i]
+        return None
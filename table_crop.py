@@ -0,0 +1,315 @@
+import fitz  # PyMuPDF
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from document_pool import document_path, open_document, pdf_input
+from instrumentation import metrics
+from page_analysis import PageAnalysis
+from render_cache import cached_render, document_digest, render_key
+from render_policy import MAX_STRIP_PIXELS, EncodedImage, RenderPolicy, StripImage, insert_encoded_image
+from result_cache import cached_page_result, function_fingerprint
+
+# Shards per worker: more shards than workers keeps every core busy when
+# matching pages are unevenly spread through the document.
+SHARDS_PER_WORKER = 4
+
+# Upper bound on pages per shard and on shards queued per worker: a finished
+# shard holds its rendered pixmaps until consumed, so these two bound memory
+# however long the document is
+MAX_SHARD_PAGES = 16
+MAX_QUEUED_SHARDS_PER_WORKER = 2
+
+
+def shard_page_ranges(page_count, shards):
+    """
+    Splits range(page_count) into at most `shards` contiguous (start, stop)
+    ranges of near-equal size, in page order.
+    """
+    shards = max(1, min(shards, page_count))
+    size, extra = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for shard in range(shards):
+        stop = start + size + (1 if shard < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _pack_pixmap(pix):
+    # Plain tuple of the raw samples, so the pixmap can cross a process boundary
+    return (pix.colorspace.n, pix.width, pix.height, pix.alpha, pix.xres, pix.yres, pix.samples)
+
+
+def _unpack_pixmap(packed):
+    n, width, height, alpha, xres, yres, samples = packed
+    colorspace = {1: fitz.csGRAY, 3: fitz.csRGB, 4: fitz.csCMYK}[n]
+    pix = fitz.Pixmap(colorspace, width, height, samples, alpha)
+    pix.set_dpi(xres, yres)
+    return pix
+
+
+def unpack_image(packed):
+    """
+    The image of a region returned by render_shard: packed pixmaps are
+    rebuilt, encoded images and None (nothing rendered) are returned as is.
+    """
+    if packed is None or isinstance(packed, (EncodedImage, StripImage)):
+        return packed
+    return _unpack_pixmap(packed)
+
+
+def _find_table_rect(doc, page, analysis, find_table_rect, cache, params):
+    metrics.count("pages_scanned")
+    with metrics.stage("detect"):
+        table_rect = _detect_table_rect(doc, page, analysis, find_table_rect, cache, params)
+    if table_rect is not None:
+        metrics.count("pages_matched")
+    return table_rect
+
+
+def _detect_table_rect(doc, page, analysis, find_table_rect, cache, params):
+    if cache is None:
+        return find_table_rect(analysis)
+
+    def detect():
+        table_rect = find_table_rect(analysis)
+        return None if table_rect is None else list(table_rect)
+
+    # Detection results are cached by page content, so reruns go straight to rendering
+    table_rect = cached_page_result(cache, doc, page, params, detect)
+    return None if table_rect is None else fitz.Rect(table_rect)
+
+
+def _render_region(page, table_rect, dpi):
+    # Regions over the strip budget are rendered as Flate RGB strips, as a RenderPolicy would,
+    # so a tall crop never needs one full-size pixmap
+    zoom = dpi / 72
+    region = (fitz.Rect(table_rect) * fitz.Matrix(zoom, zoom)).irect
+    if region.width * region.height > MAX_STRIP_PIXELS:
+        return RenderPolicy(dpi=dpi, colorspace="rgb", compression="flate").render(page, table_rect)
+
+    with metrics.stage("get_pixmap"):
+        pix = page.get_pixmap(clip=table_rect, dpi=dpi)
+    metrics.count("bytes_rendered", pix.stride * pix.height)
+    return pix
+
+
+def _render_image(page, analysis, table_rect, dpi, render_policy, render_cache=None, digest=None):
+    # A pixmap at `dpi`, or with a render policy or a render cache the region already encoded
+    def render():
+        if render_policy is not None:
+            return render_policy.render(page, table_rect, analysis)
+        return _render_region(page, table_rect, dpi)
+
+    # Without a document digest (a document opened from memory) there is nothing to key renders on
+    if render_cache is None or digest is None:
+        return render()
+    return cached_render(render_cache, render_key(digest, page.number, table_rect, dpi, render_policy), render)
+
+
+def place_image(new_page, image_rect, image):
+    """Inserts a rendered region (a pixmap, EncodedImage or StripImage) into `image_rect` of `new_page`."""
+    if isinstance(image, (EncodedImage, StripImage)):
+        insert_encoded_image(new_page, image_rect, image)
+    else:
+        new_page.insert_image(image_rect, pixmap=image)
+
+
+def render_shard(input_pdf_path, page_nums, find_table_rect, dpi, render, cache, params, render_policy=None,
+                  render_cache=None, digest=None):
+    """
+    Detects and renders the regions of pages `page_nums`, for a worker process
+    with its own copy of the document (or one from its pool).
+
+    Returns a list of (page_num, page_rect, table_rect, packed) tuples of
+    plain data that can cross a process boundary; unpack_image turns packed
+    back into the image. `digest` is the document_digest for `render_cache`.
+    The other arguments are as in iter_table_regions; `params` is the
+    function_fingerprint of `find_table_rect` when a cache is given.
+    """
+    doc, owned = open_document(input_pdf_path)
+    regions = []
+
+    for page_num in page_nums:
+        page = doc.load_page(page_num)
+        # Detection and the adaptive resolution share one text extraction
+        analysis = PageAnalysis(page)
+        table_rect = _find_table_rect(doc, page, analysis, find_table_rect, cache, params)
+        if table_rect is None:
+            continue
+
+        packed = None
+        if render:
+            image = _render_image(page, analysis, table_rect, dpi, render_policy, render_cache, digest)
+            # Encoded images are plain data already; pixmaps are packed to cross the process boundary
+            packed = _pack_pixmap(image) if isinstance(image, fitz.Pixmap) else image
+        regions.append((page_num, tuple(page.rect), tuple(table_rect), packed))
+
+    if owned:
+        doc.close()
+    return regions
+
+
+def _worker_render_shard(collect_metrics, *args):
+    # Worker processes have their own metrics; they are sent back with the shard
+    if not collect_metrics:
+        return render_shard(*args), None
+    metrics.enabled = True
+    metrics.reset()
+    return render_shard(*args), metrics.snapshot()
+
+
+def iter_table_regions(input_pdf_path, find_table_rect, workers=1, dpi=300, render=True, cache=None, pages=None, render_policy=None,
+                       render_cache=None):
+    """
+    Yields (page_num, page_rect, table_rect, image) for every page where
+    `find_table_rect(analysis)` returns a crop rectangle, in page order.
+    `analysis` is the page's PageAnalysis, so detection shares one text
+    extraction with anything else that inspects the page.
+    image is a `dpi` fitz.Pixmap (a StripImage for regions over the strip
+    budget), or with a RenderPolicy the region rendered and encoded by it
+    (an EncodedImage or StripImage, in which case `dpi` is unused).
+    With a RenderCache, `dpi` regions also arrive as a Flate EncodedImage.
+    With render=False only detection runs and image is None.
+
+    With workers > 1 the page range is split into shards that are detected
+    and rendered in a process pool; each worker opens its own document.
+    `find_table_rect` must then be a module-level function so it can be
+    pickled, and the calling script must guard its entry point with
+    `if __name__ == "__main__":`.
+
+    With a ResultCache, detection results are stored per page content, so
+    repeat runs and partly changed documents only re-detect changed pages.
+
+    `input_pdf_path` may also be an open fitz.Document (e.g. from a
+    DocumentPool), which is read in place and left open, or bytes, a memory
+    map or a stream (see document_pool.pdf_source), read without a temporary
+    file. Only paths can be sharded.
+
+    `pages` limits the run to those page numbers (ascending), e.g. the pages
+    that changed since an earlier run; by default every page is processed.
+
+    With a RenderCache, rendered regions are stored by document, page, clip
+    and resolution (or policy), so a rerun that finds the same regions only
+    changes how they are laid out and renders nothing. Documents opened from
+    memory have no digest and are always rendered.
+    """
+    params = function_fingerprint(find_table_rect) if cache is not None else None
+    # A stream is read once here; the digest and the serial pass share the buffer
+    with pdf_input(input_pdf_path) as input_pdf_path:
+        # Hashed once here, before the input is read, rather than in every worker
+        digest = document_digest(input_pdf_path) if render and render_cache is not None else None
+
+        if workers <= 1:
+            doc, owned = open_document(input_pdf_path)
+            try:
+                for page_num in range(len(doc)) if pages is None else pages:
+                    page = doc.load_page(page_num)
+                    analysis = PageAnalysis(page)
+                    table_rect = _find_table_rect(doc, page, analysis, find_table_rect, cache, params)
+                    if table_rect is None:
+                        continue
+
+                    image = _render_image(page, analysis, table_rect, dpi, render_policy, render_cache, digest) if render else None
+                    yield page_num, page.rect, table_rect, image
+                    image = None  # Only the consumer holds the image now, so inserting it can free it
+            finally:
+                if owned:
+                    doc.close()
+            return
+
+        # Every worker opens the document itself, so sharding needs a file on disk
+        input_pdf_path = document_path(input_pdf_path)
+        if input_pdf_path is None:
+            raise ValueError("Sharded extraction (workers > 1) needs a PDF file path")
+
+        if pages is None:
+            doc = fitz.open(input_pdf_path)
+            pages = range(len(doc))
+            doc.close()
+        else:
+            pages = list(pages)
+
+        shard_count = max(workers * SHARDS_PER_WORKER, -(-len(pages) // MAX_SHARD_PAGES))
+        shards = iter([pages[start:stop] for start, stop in shard_page_ranges(len(pages), shard_count)])
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = deque()
+
+            def submit_next():
+                for page_nums in shards:
+                    futures.append(executor.submit(
+                        _worker_render_shard, metrics.enabled, input_pdf_path, page_nums, find_table_rect, dpi, render, cache, params,
+                        render_policy, render_cache, digest,
+                    ))
+                    return
+
+            # Only a few shards run ahead of the consumer; each one finished frees a slot
+            for _ in range(workers * MAX_QUEUED_SHARDS_PER_WORKER):
+                submit_next()
+
+            # Merge step: shards are consumed in submission order, so output stays in page order
+            while futures:
+                regions, worker_metrics = futures.popleft().result()
+                metrics.merge(worker_metrics)
+                submit_next()
+                regions.reverse()
+                while regions:
+                    # Popped one by one, so each packed pixmap is released once it has been used
+                    page_num, page_rect, table_rect, packed = regions.pop()
+                    image = unpack_image(packed)
+                    packed = None
+                    yield page_num, fitz.Rect(page_rect), fitz.Rect(table_rect), image
+                    image = None
+
+
+def build_table_pages(input_pdf_path, output_doc, find_table_rect, layout_table_page, workers=1, dpi=300, mode="raster", cache=None, pages=None, render_policy=None,
+                      render_cache=None):
+    """
+    Adds one output page per detected table region to `output_doc`.
+
+    `layout_table_page(output_doc, page_num, page_rect, table_rect)` creates
+    the output page and returns it together with the rectangle the region
+    goes into. Serial and sharded runs place regions through the same layout
+    code, so both produce the same output document.
+
+    mode="raster" embeds each region as a `dpi` pixmap; regions of more than
+    render_policy.MAX_STRIP_PIXELS pixels are rendered and embedded as
+    Flate-compressed strips instead. mode="vector" places
+    the source page region itself with `show_pdf_page`, clipped to the table:
+    no rendering, a fraction of the output size, and the text layer stays
+    searchable.
+
+    With a RenderPolicy, raster regions are rendered at the resolution and
+    in the colourspace it picks and stored already compressed (see
+    render_policy.RenderPolicy); `dpi` is then unused.
+
+    `cache` is an optional ResultCache for the per-page detection results,
+    `render_cache` an optional RenderCache for the rendered raster regions,
+    and `pages` limits the run to some page numbers (see iter_table_regions).
+    With both caches, rerunning with only a different `layout_table_page`
+    (padding, titles, page size) detects and renders nothing again.
+    """
+    if mode not in ("raster", "vector"):
+        raise ValueError(f"Unknown crop mode: {mode!r}")
+
+    # A stream is read once here; both passes below then share the buffer
+    with pdf_input(input_pdf_path) as input_pdf_path:
+        # Vector placement reads straight from the source document
+        source_doc, owned = open_document(input_pdf_path) if mode == "vector" else (None, False)
+
+        try:
+            for page_num, page_rect, table_rect, image in iter_table_regions(
+                input_pdf_path, find_table_rect, workers=workers, dpi=dpi, render=mode == "raster", cache=cache, pages=pages,
+                render_policy=render_policy, render_cache=render_cache,
+            ):
+                new_page, image_rect = layout_table_page(output_doc, page_num, page_rect, table_rect)
+                if image is None:
+                    with metrics.stage("show_pdf_page"):
+                        new_page.show_pdf_page(image_rect, source_doc, page_num, clip=table_rect)
+                else:
+                    with metrics.stage("insert_image"):
+                        place_image(new_page, image_rect, image)
+                    image = None  # The page holds the image now; free ours right away
+        finally:
+            if owned:
+                source_doc.close()
@@ -0,0 +1,26 @@
+from columnar_output import DEFAULT_BATCH_ROWS, ColumnarTableWriter
+from jsonl_output import JsonLinesWriter
+
+# output_format values accepted by the JSON readers
+OUTPUT_FORMATS = ("json", "jsonl", "jsonl-rows", "parquet", "arrow")
+
+
+def open_table_writer(output_path, output_format, batch_rows=None):
+    """
+    Returns a streaming writer for `output_format`, or None for plain "json",
+    which the readers still write in one piece at the end.
+
+    Every writer has write_table(page_num, table_index, table_data), close()
+    and a tables_written count. `batch_rows` sets the rows per row group of
+    "parquet" and "arrow" output (default DEFAULT_BATCH_ROWS).
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format!r}")
+
+    if output_format == "json":
+        return None
+    if output_format == "jsonl":
+        return JsonLinesWriter(output_path, records="table")
+    if output_format == "jsonl-rows":
+        return JsonLinesWriter(output_path, records="row")
+    return ColumnarTableWriter(output_path, file_format=output_format, batch_rows=batch_rows or DEFAULT_BATCH_ROWS)